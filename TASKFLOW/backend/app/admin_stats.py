@@ -0,0 +1,142 @@
+"""
+Precomputed admin dashboard stats.
+
+A background refresher recomputes the snapshot every
+``ADMIN_STATS_REFRESH_SECONDS`` and stores it in Redis (one worker per
+interval, guarded by a lock key), or in process memory when Redis is not
+available. GET /admin/stats serves the stored snapshot with its age.
+"""
+import asyncio
+import json
+import logging
+from datetime import datetime, time, timedelta, timezone
+from typing import Optional
+from sqlalchemy import desc
+from starlette.concurrency import run_in_threadpool
+from .config import settings
+from .counts import CountMode, count_rows
+from .database import SessionLocal, run_with_session
+from .models import User, Project, Task, TaskStatus
+from .redis_client import get_redis
+from .schemas import UserResponse, ProjectResponse
+
+logger = logging.getLogger(__name__)
+
+STATS_KEY = "taskflow:admin_stats"
+LOCK_KEY = "taskflow:admin_stats:lock"
+
+_memory_snapshot: Optional[str] = None
+
+
+def compute_stats(db) -> dict:
+    """Compute the dashboard snapshot (JSON-serializable)."""
+    mode = CountMode(settings.ADMIN_STATS_COUNT_MODE)
+    total_users, users_exact = count_rows(db, db.query(User), mode)
+    total_projects, projects_exact = count_rows(db, db.query(Project), mode)
+    total_tasks, tasks_exact = count_rows(db, db.query(Task), mode)
+
+    recent_users = db.query(User).order_by(desc(User.created_at)).limit(5).all()
+    recent_projects = db.query(Project).order_by(desc(Project.created_at)).limit(5).all()
+
+    # Half-open UTC day range keeps the predicates sargable on the timestamp indexes
+    now = datetime.now(timezone.utc)
+    day_start = datetime.combine(now.date(), time.min, tzinfo=timezone.utc)
+    day_end = day_start + timedelta(days=1)
+    tasks_completed_today = db.query(Task).filter(
+        Task.status == TaskStatus.DONE,
+        Task.updated_at >= day_start,
+        Task.updated_at < day_end
+    ).count()
+    tasks_due_today = db.query(Task).filter(
+        Task.due_date >= day_start,
+        Task.due_date < day_end
+    ).count()
+
+    return {
+        "total_users": total_users,
+        "total_projects": total_projects,
+        "total_tasks": total_tasks,
+        "totals_are_exact": users_exact and projects_exact and tasks_exact,
+        "recent_users": [UserResponse.model_validate(u).model_dump(mode="json") for u in recent_users],
+        "recent_projects": [ProjectResponse.model_validate(p).model_dump(mode="json") for p in recent_projects],
+        "tasks_completed_today": tasks_completed_today,
+        "tasks_due_today": tasks_due_today,
+        "computed_at": now.isoformat(),
+    }
+
+
+def _compute_with_new_session() -> dict:
+    db = SessionLocal()
+    try:
+        return compute_stats(db)
+    finally:
+        db.close()
+
+
+async def load_snapshot() -> Optional[dict]:
+    redis = await get_redis()
+    raw = _memory_snapshot
+    if redis is not None:
+        try:
+            raw = await redis.get(STATS_KEY)
+        except Exception as exc:
+            logger.warning("Could not read admin stats from Redis: %s", exc)
+    return json.loads(raw) if raw else None
+
+
+async def save_snapshot(snapshot: dict):
+    global _memory_snapshot
+    raw = json.dumps(snapshot)
+    _memory_snapshot = raw
+    redis = await get_redis()
+    if redis is not None:
+        try:
+            # Keep serving the last snapshot for a while if every refresher stops
+            await redis.set(STATS_KEY, raw, ex=settings.ADMIN_STATS_REFRESH_SECONDS * 10)
+        except Exception as exc:
+            logger.warning("Could not store admin stats in Redis: %s", exc)
+
+
+async def refresh(db=None) -> dict:
+    """Recompute and store the snapshot, using the request session if given."""
+    if db is not None:
+        snapshot = await run_with_session(db, compute_stats)
+    else:
+        snapshot = await run_in_threadpool(_compute_with_new_session)
+    await save_snapshot(snapshot)
+    return snapshot
+
+
+def with_staleness(snapshot: dict) -> dict:
+    computed_at = datetime.fromisoformat(snapshot["computed_at"])
+    age = (datetime.now(timezone.utc) - computed_at).total_seconds()
+    return {
+        **snapshot,
+        "age_seconds": round(age, 3),
+        "refresh_interval_seconds": settings.ADMIN_STATS_REFRESH_SECONDS,
+        "stale": age > 2 * settings.ADMIN_STATS_REFRESH_SECONDS,
+    }
+
+
+async def _acquire_refresh_lock() -> bool:
+    """Only one worker refreshes per interval when the snapshot lives in Redis."""
+    redis = await get_redis()
+    if redis is None:
+        return True
+    try:
+        return bool(await redis.set(LOCK_KEY, "1", nx=True, ex=settings.ADMIN_STATS_REFRESH_SECONDS))
+    except Exception:
+        return True
+
+
+async def run_refresher():
+    """Background loop started from the application lifespan."""
+    while True:
+        try:
+            if await _acquire_refresh_lock():
+                await refresh()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Admin stats refresh failed")
+        await asyncio.sleep(settings.ADMIN_STATS_REFRESH_SECONDS)
@@ -0,0 +1,60 @@
+"""
+Admin audit log.
+
+``audit_log(db)`` is the session's buffer of ``admin_logs`` entries. Entries
+are kept in memory and written with one multi-row INSERT just before the
+session commits, so they share the transaction of the action they describe
+(and are discarded with it on rollback), and a bulk admin operation pays
+for one statement however many targets it logs. ``flush()`` writes them
+earlier, e.g. before reading the log back in the same transaction.
+"""
+from typing import Optional
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+from .models import AdminLog
+
+
+class AuditLog:
+    """Audit entries of one session, waiting for its commit."""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.entries: list[dict] = []
+
+    def add(self, admin_id: int, action: str, target_type: str, target_id: int, details: Optional[dict] = None):
+        # Entries belong to the current transaction, so one must exist to roll them back with
+        if not self.db.in_transaction():
+            self.db.begin()
+        self.entries.append({
+            "admin_id": admin_id,
+            "action": action,
+            "target_type": target_type,
+            "target_id": target_id,
+            "details": details or None,
+        })
+
+    def flush(self):
+        if self.entries:
+            entries, self.entries = self.entries, []
+            self.db.execute(insert(AdminLog), entries)
+
+    def clear(self):
+        self.entries = []
+
+
+def audit_log(db: Session) -> AuditLog:
+    """The session's audit buffer, flushed when the session commits."""
+    audit = db.info.get("audit_log")
+    if audit is None:
+        audit = db.info["audit_log"] = AuditLog(db)
+
+        @event.listens_for(db, "before_commit")
+        def write_entries(session):
+            audit.flush()
+
+        @event.listens_for(db, "after_soft_rollback")
+        def drop_entries(session, previous_transaction):
+            # Rolling back a savepoint keeps the entries of the enclosing transaction
+            if previous_transaction.parent is None:
+                audit.clear()
+    return audit
@@ -1,13 +1,26 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
+from fastapi import HTTPException, status
 from jose import jwt
 from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 from .config import settings
+from .database import run_with_session
 from .models import User
 
 # Initialize bcrypt context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+BCRYPT_PREFIXES = ("$2b$", "$2a$", "$2x$", "$2y$")
+
+# bcrypt releases the GIL, so hashing runs on its own small thread pool
+# instead of the shared request threadpool. At most
+# PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_SIZE calls are admitted at once.
+_hash_pool = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_hash_slots = threading.BoundedSemaphore(settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_SIZE)
 
 
 def get_password_hash(password: str) -> str:
@@ -29,7 +42,7 @@ def verify_password(plain_password: str, stored_password: str) -> bool:
         return False
     
     # Check if stored_password is a bcrypt hash
-    if stored_password.startswith(("$2b$", "$2a$", "$2x$", "$2y$")):
+    if stored_password.startswith(BCRYPT_PREFIXES):
         try:
             return pwd_context.verify(plain_password, stored_password)
         except Exception:
@@ -41,6 +54,50 @@ def verify_password(plain_password: str, stored_password: str) -> bool:
         return plain_password == stored_password
 
 
+def needs_rehash(stored_password: str) -> bool:
+    """
+    True for plain text passwords and bcrypt hashes below BCRYPT_ROUNDS.
+
+    Hashes above BCRYPT_ROUNDS are kept, so lowering the setting does not
+    rewrite every user's hash on their next login.
+    """
+    if not stored_password.startswith(BCRYPT_PREFIXES):
+        return True
+    try:
+        # $2b$<rounds>$<salt and checksum>
+        return int(stored_password.split("$")[2]) < settings.BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+
+async def _run_hashing(fn, *args):
+    """Run ``fn`` on the hashing pool, or fail fast with a 503 when it is full."""
+    if not _hash_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_pool, fn, *args)
+    finally:
+        _hash_slots.release()
+
+
+async def hash_password(password: str) -> str:
+    """Hash a password on the hashing pool."""
+    return await _run_hashing(get_password_hash, password)
+
+
+async def check_password(plain_password: str, stored_password: str) -> bool:
+    """Verify a password on the hashing pool."""
+    return await _run_hashing(verify_password, plain_password, stored_password)
+
+
+def shutdown_hashing():
+    _hash_pool.shutdown(wait=False, cancel_futures=True)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token."""
     to_encode = data.copy()
@@ -53,13 +110,40 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
-    """Authenticate a user by email and password."""
-    user = db.query(User).filter(User.email == email).first()
+def user_token_claims(user: User) -> dict:
+    """Claims identifying the user in an access token."""
+    return {
+        "sub": user.email,
+        "uid": user.id,
+        "role": user.role,
+        "ver": user.token_version or 0,
+    }
+
+
+def _store_rehash(db: Session, user: User, previous: str, new_hash: str):
+    # Skipped if the password changed since it was verified
+    db.query(User).filter(User.id == user.id, User.hashed_password == previous).update(
+        {User.hashed_password: new_hash}, synchronize_session=False
+    )
+    db.commit()
+    db.refresh(user)
+
+
+async def authenticate_user(db, email: str, password: str) -> Optional[User]:
+    """
+    Authenticate a user by email and password.
+
+    Plain text passwords and hashes below the configured bcrypt cost are
+    rehashed on a successful login.
+    """
+    user = await run_with_session(db, get_user_by_email, email)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    stored = user.hashed_password
+    if not await check_password(password, stored):
         return None
+    if needs_rehash(stored):
+        await run_with_session(db, _store_rehash, user, stored, await hash_password(password))
     return user
 
 
@@ -0,0 +1,147 @@
+"""
+Row counts for admin listings and stats.
+
+Two modes:
+
+- ``exact``: ``SELECT count(*)``, cached in-process for
+  ``COUNT_CACHE_TTL_SECONDS`` per distinct query.
+- ``estimate``: planner statistics, which cost the same on any table size.
+  Postgres uses ``pg_class.reltuples`` for whole tables and the row estimate
+  of ``EXPLAIN`` for filtered queries; SQLite uses ``sqlite_stat1`` (after
+  ANALYZE) or ``max(id)`` for whole tables. When no estimate is available
+  the exact (cached) count is used.
+
+Each call returns ``(total, is_exact)``.
+"""
+import enum
+import json
+import threading
+import time
+from typing import Optional
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+from .config import settings
+
+
+class CountMode(str, enum.Enum):
+    EXACT = "exact"
+    ESTIMATE = "estimate"
+
+
+class TTLCache:
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: dict = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            if len(self._entries) >= self.maxsize:
+                now = time.monotonic()
+                self._entries = {k: v for k, v in self._entries.items() if v[0] >= now}
+                if len(self._entries) >= self.maxsize:
+                    self._entries.clear()
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+count_cache = TTLCache(settings.COUNT_CACHE_TTL_SECONDS)
+
+
+def _compile(db: Session, statement):
+    return statement.compile(dialect=db.get_bind().dialect)
+
+
+def exact_count(db: Session, query) -> int:
+    """Exact count of ``query``, cached per compiled statement and parameters."""
+    query = query.order_by(None)
+    compiled = _compile(db, query.statement)
+    key = (str(compiled), tuple(sorted((k, repr(v)) for k, v in compiled.params.items())))
+    total = count_cache.get(key)
+    if total is None:
+        total = query.count()
+        count_cache.set(key, total)
+    return total
+
+
+def _single_table(statement):
+    froms = statement.get_final_froms()
+    if statement.whereclause is None and len(froms) == 1 and hasattr(froms[0], "name"):
+        return froms[0]
+    return None
+
+
+def _postgres_estimate(db: Session, statement) -> Optional[int]:
+    table = _single_table(statement)
+    if table is not None:
+        reltuples = db.execute(
+            text("SELECT reltuples FROM pg_class WHERE oid = to_regclass(:name)"),
+            {"name": table.name},
+        ).scalar()
+        # -1 means the table was never vacuumed or analyzed
+        return int(reltuples) if reltuples is not None and reltuples >= 0 else None
+
+    connection = db.connection()
+    compiled = statement.compile(dialect=connection.dialect)
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _sqlite_estimate(db: Session, statement) -> Optional[int]:
+    table = _single_table(statement)
+    if table is None:
+        return None
+    stat = None
+    # sqlite_stat1 only exists once ANALYZE has run
+    has_stats = db.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+    ).scalar()
+    if has_stats:
+        stat = db.execute(
+            text("SELECT stat FROM sqlite_stat1 WHERE tbl = :name LIMIT 1"),
+            {"name": table.name},
+        ).scalar()
+    if stat:
+        return int(stat.split()[0])
+    if "id" in table.c:
+        return db.execute(select(func.max(table.c.id))).scalar() or 0
+    return None
+
+
+def estimate_count(db: Session, query) -> Optional[int]:
+    """Planner estimate of the rows ``query`` returns, None if unavailable."""
+    statement = query.order_by(None).statement
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return _postgres_estimate(db, statement)
+    if dialect == "sqlite":
+        return _sqlite_estimate(db, statement)
+    return None
+
+
+def count_rows(db: Session, query, mode: CountMode = CountMode.EXACT) -> tuple[int, bool]:
+    if mode == CountMode.ESTIMATE:
+        estimate = estimate_count(db, query)
+        if estimate is not None:
+            return estimate, False
+    return exact_count(db, query), True
@@ -1,24 +1,106 @@
+import contextlib
+import functools
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
 from .config import settings
+from .pool_stats import engine_options, instrument
+from .metrics import track_statements
+from .profiling import in_thread, track_query_shapes
+
+# An async driver in DATABASE_URL (postgresql+asyncpg://, sqlite+aiosqlite://)
+# selects the async stack for request handling. The sync engine always exists
+# for migrations, CLI commands and the few handlers that stay on the threadpool.
+database_url = make_url(settings.DATABASE_URL)
+is_async = database_url.get_dialect().is_async
+
+if is_async:
+    sync_database_url = database_url.set(drivername=database_url.get_backend_name())
+else:
+    sync_database_url = database_url
 
 engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    echo=False
+    sync_database_url,
+    echo=False,
+    **engine_options(sync_database_url)
 )
+instrument(engine, "sync")
+if settings.METRICS_ENABLED:
+    track_statements(engine)
+if settings.N_PLUS_ONE_DETECTION != "off":
+    track_query_shapes(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+if is_async:
+    async_engine = create_async_engine(
+        database_url,
+        echo=False,
+        **engine_options(database_url)
+    )
+    instrument(async_engine.sync_engine, "async")
+    if settings.METRICS_ENABLED:
+        track_statements(async_engine.sync_engine)
+    if settings.N_PLUS_ONE_DETECTION != "off":
+        track_query_shapes(async_engine.sync_engine)
+    # Handler results are serialized after the session work is done, outside
+    # the greenlet that can lazy-load, so keep committed objects loaded.
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False
+    )
+else:
+    async_engine = None
+    AsyncSessionLocal = None
+
 Base = declarative_base()
 
 
-def get_db():
-    """Dependency for getting database session"""
+@contextlib.asynccontextmanager
+async def session_scope():
+    """A session of the request stack's kind, for work outside a request's dependencies."""
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
+        await run_in_threadpool(db.close)
+
+
+async def get_db():
+    """Dependency for getting database session (an AsyncSession on the async stack)"""
+    async with session_scope() as db:
+        yield db
+
+
+async def run_with_session(db, fn, *args, **kwargs):
+    """
+    Call ``fn(session, *args, **kwargs)`` with a sync Session.
+
+    On the async stack this goes through AsyncSession.run_sync, so the
+    statements are awaited on the event loop instead of holding a threadpool
+    slot; on the sync stack ``fn`` runs in the threadpool.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(in_thread(fn), db, *args, **kwargs)
+
+
+def db_handler(fn):
+    """
+    Turn a sync route handler taking ``db`` into an async one that runs its
+    body through ``run_with_session``. The signature is preserved, so FastAPI
+    resolves the same parameters and dependencies.
+    """
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        db = kwargs.pop("db")
+        return await run_with_session(db, lambda session: fn(*args, db=session, **kwargs))
 
+    return wrapper
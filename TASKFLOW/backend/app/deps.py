@@ -1,21 +1,34 @@
-from typing import Generator
+from typing import Generator, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
-from .database import get_db
+from .database import get_db, run_with_session
 from .auth import get_user_by_email
 from .config import settings
+from .models import User, Project, Task, Progress
+from .principals import Principal, principal_cache
 from .schemas import TokenData
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/users/login")
 
 
-def get_current_user(
+async def get_current_user(
     db: Session = Depends(get_db),
     token: str = Depends(oauth2_scheme)
-) -> dict:
-    """Get current authenticated user"""
+) -> Principal:
+    """
+    Get current authenticated user.
+
+    Tokens carrying the uid/ver claims are resolved from the principal cache
+    and only hit the database on a miss; older email-only tokens fall back to
+    the lookup by email.
+    """
+    return await authenticate_token(db, token)
+
+
+async def authenticate_token(db, token: str) -> Principal:
+    """Resolve a bearer token to its principal, or raise 401."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -26,12 +39,105 @@ def get_current_user(
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
-        token_data = TokenData(email=email)
-    except JWTError:
+        token_data = TokenData(
+            email=email,
+            user_id=payload.get("uid"),
+            token_version=payload.get("ver"),
+        )
+    except (JWTError, ValueError):
         raise credentials_exception
-    
-    user = get_user_by_email(db, email=token_data.email)
-    if user is None:
+
+    if token_data.user_id is None or token_data.token_version is None:
+        user = await run_with_session(db, get_user_by_email, email=token_data.email)
+        if user is None:
+            raise credentials_exception
+        return Principal.from_user(user)
+
+    principal = principal_cache.get(token_data.user_id, token_data.token_version)
+    if principal is not None:
+        return principal
+
+    user = await run_with_session(db, _get_user_by_id, token_data.user_id)
+    if user is None or (user.token_version or 0) != token_data.token_version:
         raise credentials_exception
-    return user
+    return principal_cache.put(Principal.from_user(user))
+
+
+def _get_user_by_id(db: Session, user_id: int) -> Optional[User]:
+    return db.query(User).filter(User.id == user_id).first()
+
+
+def _memoized(db: Session, key: tuple, load):
+    """Cache ``load()`` in the session, which lives as long as the request."""
+    memo = db.info.setdefault("authorized_loads", {})
+    if key not in memo:
+        memo[key] = load()
+    return memo[key]
+
+
+def load_owned_project(db: Session, project_id: int, owner_id: int) -> Optional[Project]:
+    return _memoized(db, (Project, project_id, owner_id), lambda: db.query(Project).filter(
+        Project.id == project_id,
+        Project.owner_id == owner_id
+    ).first())
 
+
+def load_owned_task(db: Session, task_id: int, owner_id: int) -> Optional[Task]:
+    """Load a task only if its project belongs to ``owner_id`` (one SELECT)."""
+    return _memoized(db, (Task, task_id, owner_id), lambda: db.query(Task).join(
+        Project, Project.id == Task.project_id
+    ).filter(
+        Task.id == task_id,
+        Project.owner_id == owner_id
+    ).first())
+
+
+def load_owned_progress(db: Session, project_id: int, owner_id: int) -> Optional[tuple[Project, Optional[Progress]]]:
+    """Load an owned project with its progress row (None if missing) in one SELECT."""
+    def load():
+        row = db.query(Project, Progress).outerjoin(
+            Progress, Progress.project_id == Project.id
+        ).filter(
+            Project.id == project_id,
+            Project.owner_id == owner_id
+        ).first()
+        if row is not None:
+            db.info.setdefault("authorized_loads", {})[(Project, project_id, owner_id)] = row[0]
+        return row
+    return _memoized(db, (Progress, project_id, owner_id), load)
+
+
+async def get_owned_project(
+    project_id: int,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+) -> Project:
+    """Project from the path, 404 unless the current user owns it."""
+    project = await run_with_session(db, load_owned_project, project_id, current_user.id)
+    if not project:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
+    return project
+
+
+async def get_owned_task(
+    task_id: int,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+) -> Task:
+    """Task from the path, 404 unless it is in a project the current user owns."""
+    task = await run_with_session(db, load_owned_task, task_id, current_user.id)
+    if not task:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
+    return task
+
+
+async def get_owned_progress(
+    project_id: int,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+) -> tuple[Project, Optional[Progress]]:
+    """(project, progress) for an owned project from the path; progress may be None."""
+    row = await run_with_session(db, load_owned_progress, project_id, current_user.id)
+    if not row:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
+    return row[0], row[1]
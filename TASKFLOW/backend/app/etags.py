@@ -0,0 +1,43 @@
+"""
+Weak ETags for read endpoints.
+
+List handlers derive the tag from a cheap aggregate of the rows they would
+return (count, max id, max updated_at, sum of versions) and answer
+304 Not Modified before loading or serializing anything when the client's
+If-None-Match already carries it. Responses are marked ``private, no-cache``
+so browsers keep them and revalidate on every fetch.
+
+updated_at only tells apart writes in different clock ticks: on Postgres
+that is a microsecond, on SQLite (CURRENT_TIMESTAMP) a whole second.
+"""
+import hashlib
+from typing import Optional
+from fastapi import Response, status
+
+
+def weak_etag(*parts) -> str:
+    """Weak validator for the given (repr-able) state."""
+    return 'W/"%s"' % hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of ``etag`` against an If-None-Match header."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def _validator_headers(etag: str) -> dict:
+    # Vary: the same URL returns each user's own rows
+    return {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=_validator_headers(etag))
+
+
+def set_etag(response: Response, etag: str):
+    response.headers.update(_validator_headers(etag))
@@ -0,0 +1,172 @@
+"""
+Per-project event fan-out for the WebSocket / SSE streams.
+
+Task routes call ``publish_after_commit`` once their transaction is
+committed. Messages go out on the Redis channel ``taskflow:project:<id>`` so
+clients connected to any uvicorn worker receive them, or straight to this
+process's subscribers when Redis is not available.
+
+Each worker holds a single pub/sub connection and a single reader task no
+matter how many clients are connected; a client connection is an asyncio
+queue, so idle streams cost a few kilobytes each. A client that falls
+``EVENT_QUEUE_SIZE`` messages behind gets a ``resync`` message instead of
+the backlog and catches up through GET /tasks/changes.
+"""
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from typing import Optional
+from .config import settings
+from .redis_client import get_redis
+from .schemas import TaskResponse
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "taskflow:project:"
+RESYNC = json.dumps({"type": "resync"})
+
+
+def task_event(kind: str, task) -> dict:
+    """``task.created`` / ``task.updated`` with the task as the API returns it."""
+    if not isinstance(task, TaskResponse):
+        task = TaskResponse.model_validate(task)
+    return {"type": f"task.{kind}", "task": task.model_dump(mode="json")}
+
+
+def task_deleted_event(task_id: int) -> dict:
+    return {"type": "task.deleted", "task_id": task_id}
+
+
+def progress_event(counters: Optional[dict]) -> list[dict]:
+    """``progress.updated`` for counters returned by app.progress_counters, if any."""
+    return [{"type": "progress.updated", "progress": counters}] if counters else []
+
+
+class Broker:
+    def __init__(self):
+        self._subscribers: dict[int, set[asyncio.Queue]] = defaultdict(set)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    def bind(self):
+        """Remember the event loop that handler threads publish to."""
+        self._loop = asyncio.get_running_loop()
+
+    async def subscribe(self, project_id: int) -> asyncio.Queue:
+        self.bind()
+        queue = asyncio.Queue(maxsize=settings.EVENT_QUEUE_SIZE)
+        first = not self._subscribers[project_id]
+        self._subscribers[project_id].add(queue)
+        if first:
+            await self._listen([project_id])
+        return queue
+
+    async def unsubscribe(self, project_id: int, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(project_id)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if subscribers:
+            return
+        del self._subscribers[project_id]
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.unsubscribe(CHANNEL_PREFIX + str(project_id))
+            except Exception as exc:
+                logger.warning("Could not unsubscribe from project %s events: %s", project_id, exc)
+
+    async def publish(self, project_id: int, message: dict):
+        raw = json.dumps(message)
+        redis = await get_redis()
+        if redis is not None:
+            if self._pubsub is None and self._subscribers:
+                # Subscription lost earlier: restore it before relying on Redis
+                await self._listen([])
+            try:
+                await redis.publish(CHANNEL_PREFIX + str(project_id), raw)
+                return
+            except Exception as exc:
+                logger.warning("Publishing project %s events without Redis: %s", project_id, exc)
+        self._deliver(project_id, raw)
+
+    async def close(self):
+        if self._reader is not None:
+            self._reader.cancel()
+        await self._drop_pubsub()
+
+    def _deliver(self, project_id: int, raw: str):
+        for queue in self._subscribers.get(project_id, ()):
+            try:
+                queue.put_nowait(raw)
+            except asyncio.QueueFull:
+                # Too far behind: replace the backlog with a resync request
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+
+    async def _listen(self, project_ids: list[int]):
+        """Subscribe this worker to ``project_ids`` (all subscribed projects on connect)."""
+        redis = await get_redis()
+        if redis is None:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            try:
+                if self._pubsub is not None:
+                    if project_ids:
+                        await self._pubsub.subscribe(*(CHANNEL_PREFIX + str(p) for p in project_ids))
+                    return
+                if not self._subscribers:
+                    return
+                pubsub = redis.pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(*(CHANNEL_PREFIX + str(p) for p in self._subscribers))
+                self._pubsub = pubsub
+                if self._reader is None:
+                    self._reader = asyncio.create_task(self._read())
+            except Exception as exc:
+                logger.warning("Project events fall back to this process: %s", exc)
+                await self._drop_pubsub()
+
+    async def _read(self):
+        try:
+            while self._pubsub is not None and self._subscribers:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is not None and message["type"] == "message":
+                    self._deliver(int(message["channel"][len(CHANNEL_PREFIX):]), message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("Lost the Redis event subscription: %s", exc)
+            await self._drop_pubsub()
+        finally:
+            self._reader = None
+        # Nobody left to deliver to: the next subscriber reconnects
+        await self._drop_pubsub()
+
+    async def _drop_pubsub(self):
+        pubsub, self._pubsub = self._pubsub, None
+        if pubsub is not None:
+            try:
+                await pubsub.close()
+            except Exception:
+                pass
+
+
+broker = Broker()
+
+
+def publish_after_commit(project_id: int, change_seq: Optional[int], events: list[dict]):
+    """
+    Publish a committed change of a project's tasks. Callable from handler
+    code on the threadpool or inside ``run_sync``; a no-op before any loop
+    has been bound.
+    """
+    loop = broker._loop
+    if not events or loop is None or loop.is_closed():
+        return
+    message = {"project_id": project_id, "change_seq": change_seq, "events": events}
+    asyncio.run_coroutine_threadsafe(broker.publish(project_id, message), loop)
@@ -1,14 +1,41 @@
+import asyncio
+import contextlib
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
+from fastapi.responses import ORJSONResponse, PlainTextResponse, RedirectResponse
 from .config import settings
-from .database import engine, Base
-from .routers import users, projects, tasks, progress, admin
+from .routers import users, projects, tasks, progress, admin, events
+from . import admin_stats
+from .redis_client import close_redis
+from .events import broker
+from .auth import shutdown_hashing
+from .rate_limit import RateLimitMiddleware
+from .profiling import ProfilingMiddleware
+from . import metrics
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="TaskFlow API", version="1.0.0")
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background services
+    broker.bind()
+    stats_refresher = asyncio.create_task(admin_stats.run_refresher())
+    yield
+    stats_refresher.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await stats_refresher
+    await broker.close()
+    await close_redis()
+    shutdown_hashing()
+
+
+# orjson renders every JSON response; list routes also skip jsonable_encoder (app.serialization)
+app = FastAPI(title="TaskFlow API", version="1.0.0", lifespan=lifespan, default_response_class=ORJSONResponse)
+
+# Profiled requests are rate limited like any other
+app.add_middleware(ProfilingMiddleware)
+
+# Rate limiting runs inside CORS so 429 responses still carry CORS headers
+app.add_middleware(RateLimitMiddleware)
 
 # CORS middleware
 app.add_middleware(
@@ -18,14 +45,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "Retry-After", "X-Profile-Id"],
 )
 
+# Metrics wrap everything else, so rate-limited and CORS preflight requests are counted too
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
 # Include routers
 app.include_router(users.router, prefix="/api/v1/users", tags=["users"])
 app.include_router(projects.router, prefix="/api/v1/projects", tags=["projects"])
 app.include_router(tasks.router, prefix="/api/v1/tasks", tags=["tasks"])
 app.include_router(progress.router, prefix="/api/v1/progress", tags=["progress"])
 app.include_router(admin.router, prefix="/api/v1/admin", tags=["admin"])
+app.include_router(events.router, prefix="/api/v1/events", tags=["events"])
 
 
 @app.get("/")
@@ -37,3 +70,9 @@ def root():
 def health_check():
     return {"status": "healthy"}
 
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def get_metrics():
+        # Rendered on the event loop, the only thread that updates the counters
+        return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,229 @@
+"""
+Request metrics in the Prometheus text format.
+
+``MetricsMiddleware`` times every HTTP request and counts its response
+bytes, labelled by method and route template (``/api/v1/tasks/{task_id}``,
+not the raw path, so label cardinality stays bounded; unmatched paths share
+one label). SQLAlchemy cursor hooks from ``track_statements`` add the
+statements run and the time spent in the database to the request that ran
+them; the request is found through a context variable, which follows the
+handler into the threadpool and into AsyncSession greenlets.
+
+``render()`` produces the exposition served by GET /metrics, together with
+the pool figures of app.pool_stats. Figures are per worker process, like
+the pool stats: scrape each worker, or run one per container.
+
+Counters are only updated on the event loop thread, so recording a request
+is a few dict lookups and list increments with no locking; the database
+hooks cost two perf_counter calls per statement.
+"""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+from . import pool_stats
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+UNMATCHED_ROUTE = "<unmatched>"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# pool_stats fields that only ever increase; the rest are gauges
+POOL_COUNTERS = {
+    "connects", "checkouts", "checkins", "invalidations", "soft_invalidations",
+    "pings", "ping_failures", "timeouts",
+}
+
+
+class Histogram:
+    """Fixed buckets; counts are kept per bucket and made cumulative on render."""
+
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class RouteMetrics:
+    """Everything recorded for one (method, route) pair."""
+
+    __slots__ = ("responses", "duration", "size", "statements", "db_time")
+
+    def __init__(self):
+        self.responses: dict[int, int] = {}
+        self.duration = Histogram(LATENCY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+        self.statements = Histogram(STATEMENT_BUCKETS)
+        self.db_time = Histogram(LATENCY_BUCKETS)
+
+
+class RequestStats:
+    """Database work of the current request, filled in by the cursor hooks."""
+
+    __slots__ = ("statements", "db_time")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("taskflow_request_stats", default=None)
+_routes: dict[tuple[str, str], RouteMetrics] = {}
+_in_flight = 0
+
+
+def track_statements(engine):
+    """Attach cursor hooks to a (sync) engine that charge statements to the current request."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = _current.get()
+        if stats is None:
+            return
+        started = conn.info.get("metrics_started")
+        if started:
+            stats.db_time += time.perf_counter() - started.pop()
+        stats.statements += 1
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        # A failed statement never reaches after_cursor_execute
+        conn = exception_context.connection
+        if conn is not None and _current.get() is not None:
+            started = conn.info.get("metrics_started")
+            if started:
+                started.pop()
+
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+def record(method: str, route: str, status_code: int, seconds: float, size: int, stats: RequestStats):
+    metrics = _routes.get((method, route))
+    if metrics is None:
+        metrics = _routes[(method, route)] = RouteMetrics()
+    metrics.responses[status_code] = metrics.responses.get(status_code, 0) + 1
+    metrics.duration.observe(seconds)
+    metrics.size.observe(size)
+    metrics.statements.observe(stats.statements)
+    metrics.db_time.observe(stats.db_time)
+
+
+class MetricsMiddleware:
+    """Records latency, response size, in-flight count and DB work per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        global _in_flight
+        stats = RequestStats()
+        token = _current.set(stats)
+        status_code = 500
+        size = 0
+
+        async def send_with_metrics(message):
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        _in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            _in_flight -= 1
+            _current.reset(token)
+            # The router leaves the matched route in the scope
+            record(scope["method"], _route_label(scope), status_code, time.perf_counter() - started, size, stats)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items())
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def _histogram_lines(name: str, labels: str, histogram: Histogram) -> list[str]:
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{_format_value(float(bound))}"}} {cumulative}')
+    cumulative += histogram.counts[-1]
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+    lines.append(f"{name}_sum{{{labels}}} {_format_value(histogram.sum)}")
+    lines.append(f"{name}_count{{{labels}}} {cumulative}")
+    return lines
+
+
+HISTOGRAMS = (
+    ("http_request_duration_seconds", "duration", "Time from request start to the last response byte."),
+    ("http_response_size_bytes", "size", "Response body size."),
+    ("http_request_db_statements", "statements", "SQL statements executed per request."),
+    ("http_request_db_seconds", "db_time", "Time spent executing SQL statements per request."),
+)
+
+
+def render() -> str:
+    """All metrics of this process in the Prometheus text exposition format."""
+    routes = sorted(_routes.items())
+    out = [
+        "# HELP http_requests_in_flight Requests currently being handled.",
+        "# TYPE http_requests_in_flight gauge",
+        f"http_requests_in_flight {_in_flight}",
+        "# HELP http_requests_total Requests handled, by response status.",
+        "# TYPE http_requests_total counter",
+    ]
+    for (method, route), metrics in routes:
+        for status_code, count in sorted(metrics.responses.items()):
+            out.append(f"http_requests_total{{{_labels(method=method, route=route, status=status_code)}}} {count}")
+    for name, attribute, help_text in HISTOGRAMS:
+        out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} histogram")
+        for (method, route), metrics in routes:
+            out.extend(_histogram_lines(name, _labels(method=method, route=route), getattr(metrics, attribute)))
+
+    pools = pool_stats.snapshot()
+    fields = sorted({field for data in pools.values() for field in data})
+    for field in fields:
+        if field in POOL_COUNTERS:
+            name = f"db_pool_{field}_total"
+            out.append(f"# TYPE {name} counter")
+        else:
+            name = f"db_pool_{field}"
+            out.append(f"# TYPE {name} gauge")
+        for engine_name, data in sorted(pools.items()):
+            if field in data:
+                out.append(f"{name}{{{_labels(engine=engine_name)}}} {_format_value(data[field])}")
+    return "\n".join(out) + "\n"
+
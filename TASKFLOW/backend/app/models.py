@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Enum as SQLEnum, Boolean
+from sqlalchemy import Column, Integer, BigInteger, String, Float, ForeignKey, DateTime, Enum as SQLEnum, Boolean, Index, JSON
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -22,10 +23,17 @@ class User(Base):
     is_admin = Column(Boolean, default=False, nullable=False)
     role = Column(String, default="user", nullable=False) # 'user' or 'admin'
     is_suspended = Column(Boolean, default=False, nullable=False)
+    # Bumped to revoke every access token issued before the change
+    token_version = Column(Integer, default=0, server_default="0", nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     projects = relationship("Project", back_populates="owner")
 
+    __table_args__ = (
+        # Keyset pagination (app.pagination)
+        Index("ix_users_created_at_id", "created_at", "id"),
+    )
+
 
 class Project(Base):
     __tablename__ = "projects"
@@ -36,10 +44,19 @@ class Project(Base):
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Last change sequence handed to this project's tasks (app.task_changes)
+    task_change_seq = Column(BigInteger, default=0, server_default="0", nullable=False)
     
     owner = relationship("User", back_populates="projects")
     tasks = relationship("Task", back_populates="project", cascade="all, delete-orphan")
-    progress = relationship("Progress", back_populates="project", uselist=False)
+    progress = relationship("Progress", back_populates="project", uselist=False, cascade="all, delete-orphan")
+    task_tombstones = relationship("TaskTombstone", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # Owner's project list, newest first
+        Index("ix_projects_owner_id_created_at", "owner_id", "created_at"),
+        Index("ix_projects_created_at_id", "created_at", "id"),
+    )
 
 
 class Task(Base):
@@ -50,7 +67,7 @@ class Task(Base):
     description = Column(String)
     status = Column(SQLEnum(TaskStatus), default=TaskStatus.TODO, nullable=False)
     # New scheduling and priority fields
-    due_date = Column(DateTime(timezone=True), nullable=True)
+    due_date = Column(DateTime(timezone=True), nullable=True, index=True)
     scheduled_day = Column(DateTime(timezone=True), nullable=True)
     class Priority(str, enum.Enum):
         LOW = "low"
@@ -59,10 +76,39 @@ class Task(Base):
     priority = Column(String, default=Priority.MEDIUM.value)
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), index=True)
+    # Optimistic concurrency: bumped on every write, checked by ORM flushes
+    version = Column(Integer, default=1, server_default="1", nullable=False)
+    # Project change sequence of the last write, for delta sync
+    change_seq = Column(BigInteger, default=0, server_default="0", nullable=False)
     
     project = relationship("Project", back_populates="tasks")
 
+    __mapper_args__ = {"version_id_col": version}
+    __table_args__ = (
+        # Per-project filters by status and per-project listings by age
+        Index("ix_tasks_project_id_status", "project_id", "status"),
+        Index("ix_tasks_project_id_created_at", "project_id", "created_at"),
+        Index("ix_tasks_created_at_id", "created_at", "id"),
+        # Delta sync: changes of a project after a (change_seq, id) cursor
+        Index("ix_tasks_project_id_change_seq_id", "project_id", "change_seq", "id"),
+    )
+
+
+class TaskTombstone(Base):
+    """A task deleted from (or moved out of) a project, for delta sync."""
+    __tablename__ = "task_tombstones"
+    
+    id = Column(Integer, primary_key=True)
+    task_id = Column(Integer, nullable=False)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    change_seq = Column(BigInteger, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_task_tombstones_project_id_change_seq_task_id", "project_id", "change_seq", "task_id"),
+    )
+
 
 class Progress(Base):
     __tablename__ = "progress"
@@ -70,6 +116,11 @@ class Progress(Base):
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"), unique=True, nullable=False)
     completion_percentage = Column(Float, default=0.0)
+    # Task counters maintained incrementally by app.progress_counters
+    total_tasks = Column(Integer, default=0, server_default="0", nullable=False)
+    todo_tasks = Column(Integer, default=0, server_default="0", nullable=False)
+    in_progress_tasks = Column(Integer, default=0, server_default="0", nullable=False)
+    done_tasks = Column(Integer, default=0, server_default="0", nullable=False)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     project = relationship("Project", back_populates="progress")
@@ -83,8 +134,12 @@ class AdminLog(Base):
     action = Column(String, nullable=False)  # e.g., "user_deleted", "user_promoted", "page_deleted"
     target_type = Column(String, nullable=False)  # e.g., "user", "project", "task"
     target_id = Column(Integer, nullable=False)
-    details = Column(String)  # JSON details of the action
+    details = Column(JSON().with_variant(JSONB(), "postgresql"))  # details of the action (JSONB on Postgres)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     admin = relationship("User")
 
+    __table_args__ = (
+        Index("ix_admin_logs_created_at_id", "created_at", "id"),
+    )
+
@@ -0,0 +1,116 @@
+"""
+Keyset (cursor) pagination over (created_at, id), newest first.
+
+Listings accept an opaque ``cursor`` returned as ``next_cursor`` or
+``prev_cursor`` by the previous page; every page is then a range scan on
+(created_at, id) regardless of depth. Without a cursor, ``page``/``per_page``
+keep working as OFFSET pagination for existing clients, and the response
+still carries cursors so a client can switch to keyset after the first page.
+The total count is only computed when asked for (by default in page mode),
+exactly or as an estimate (see app.counts).
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Callable, Optional
+from fastapi import HTTPException, status
+from sqlalchemy import desc, func, select, tuple_
+from sqlalchemy.orm import aliased
+from .counts import CountMode, count_rows
+
+
+def encode_cursor(row, direction: str) -> str:
+    payload = {"c": row.created_at.isoformat() if row.created_at else None, "i": row.id, "d": direction}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[Optional[datetime], int, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = datetime.fromisoformat(payload["c"]) if payload["c"] else None
+        row_id = int(payload["i"])
+        direction = payload["d"]
+        if direction not in ("next", "prev"):
+            raise ValueError(direction)
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return created_at, row_id, direction
+
+
+def paginate(
+    query,
+    model,
+    page: int = 1,
+    per_page: int = 20,
+    cursor: Optional[str] = None,
+    include_total: Optional[bool] = None,
+    count_mode: CountMode = CountMode.EXACT,
+    expand: Optional[Callable] = None,
+) -> dict:
+    """
+    Page through ``query`` (a Query over ``model``) by (created_at, id) desc.
+
+    The total, when included, comes from ``counts.count_rows`` in
+    ``count_mode``. ``expand(query, entity)`` may add joins and columns to
+    the page: it receives a Query over ``entity``, an alias of the page
+    subquery, so whatever it joins is bounded by ``per_page`` rows. Items are
+    then result rows whose first element is the ``model`` instance.
+    """
+    if include_total is None:
+        include_total = cursor is None
+    total = total_is_exact = None
+    if include_total:
+        total, total_is_exact = count_rows(query.session, query, count_mode)
+
+    key = tuple_(model.created_at, model.id)
+    newest_first = (desc(model.created_at), desc(model.id))
+
+    def fetch(ordered, oldest_first: bool = False):
+        if expand is None:
+            return ordered.all()
+        entity = aliased(model, ordered.subquery())
+        order = (entity.created_at, entity.id) if oldest_first else (desc(entity.created_at), desc(entity.id))
+        return expand(query.session.query(entity), entity).order_by(*order).all()
+
+    if cursor:
+        created_at, row_id, direction = decode_cursor(cursor)
+        # Compare against the anchor row's stored created_at when it still
+        # exists; it sidesteps datetime formatting differences between the
+        # cursor and the column (SQLite stores timestamps as text).
+        anchor_created_at = func.coalesce(
+            select(model.created_at).where(model.id == row_id).scalar_subquery(),
+            created_at,
+        )
+        anchor = tuple_(anchor_created_at, row_id)
+        if direction == "prev":
+            rows = fetch(
+                query.filter(key > anchor).order_by(model.created_at, model.id).limit(per_page + 1),
+                oldest_first=True,
+            )
+            has_prev = len(rows) > per_page
+            rows = rows[:per_page][::-1]
+            has_next = True
+        else:
+            rows = fetch(query.filter(key < anchor).order_by(*newest_first).limit(per_page + 1))
+            has_next = len(rows) > per_page
+            rows = rows[:per_page]
+            has_prev = True
+        page = None
+    else:
+        rows = fetch(query.order_by(*newest_first).offset((page - 1) * per_page).limit(per_page + 1))
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_prev = page > 1
+
+    keys = [row[0] for row in rows] if expand is not None else rows
+    return {
+        "items": rows,
+        "total": total,
+        "total_is_exact": total_is_exact,
+        "page": page,
+        "per_page": per_page,
+        "next_cursor": encode_cursor(keys[-1], "next") if rows and has_next else None,
+        "prev_cursor": encode_cursor(keys[0], "prev") if rows and has_prev else None,
+    }
@@ -0,0 +1,188 @@
+"""
+Connection pool configuration and instrumentation.
+
+Pools are built from the DB_POOL_* settings and report checkout wait time,
+timeouts, connections in use, overflow and invalidations. ``snapshot()``
+returns the figures for every instrumented engine; they are served by
+GET /api/v1/admin/db-pool.
+"""
+import threading
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from .config import settings
+
+PRE_PING_POLICIES = ("always", "idle", "never")
+
+
+class PoolStats:
+    """Counters for one pool; updated from pool events."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.soft_invalidations = 0
+        self.pings = 0
+        self.ping_failures = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def incr(self, counter: str, amount: int = 1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        pool = self.pool
+        with self._lock:
+            waits = self.checkouts + self.timeouts
+            data = {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "soft_invalidations": self.soft_invalidations,
+                "pings": self.pings,
+                "ping_failures": self.ping_failures,
+                "timeouts": self.timeouts,
+                "checkout_wait_avg_ms": round(self.wait_total / waits * 1000, 3) if waits else 0.0,
+                "checkout_wait_max_ms": round(self.wait_max * 1000, 3),
+            }
+        if isinstance(pool, QueuePool):
+            data.update({
+                "pool_size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "in_use": pool.checkedout(),
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": pool._max_overflow,
+            })
+        return data
+
+
+class _TimedGetMixin:
+    """Measures how long a checkout waits for a free connection."""
+
+    stats: PoolStats = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            if self.stats is not None:
+                self.stats.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        if self.stats is not None:
+            self.stats.record_wait(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        # Pools are recreated on engine.dispose(); keep reporting to the same stats
+        new_pool = super().recreate()
+        new_pool.stats = self.stats
+        if self.stats is not None:
+            self.stats.pool = new_pool
+        return new_pool
+
+
+class TimedQueuePool(_TimedGetMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedGetMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+_registry: dict[str, PoolStats] = {}
+
+
+def engine_options(url) -> dict:
+    """Keyword arguments for create_engine/create_async_engine from settings."""
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING == "always"}
+    if settings.DB_POOL_PRE_PING not in PRE_PING_POLICIES:
+        raise ValueError(f"DB_POOL_PRE_PING must be one of {PRE_PING_POLICIES}")
+
+    # SQLite keeps SQLAlchemy's default pool for its driver
+    if url.get_backend_name() != "sqlite":
+        options.update(
+            poolclass=TimedAsyncAdaptedQueuePool if url.get_dialect().is_async else TimedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+        )
+
+    timeout_ms = settings.DB_STATEMENT_TIMEOUT_MS
+    if timeout_ms and url.get_backend_name() == "postgresql":
+        if url.get_driver_name() == "asyncpg":
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(timeout_ms)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout_ms}"}
+    return options
+
+
+def instrument(engine, name: str) -> PoolStats:
+    """Attach pool event hooks to a (sync) engine and register its stats."""
+    stats = PoolStats(name)
+    pool = engine.pool
+    pool.stats = stats
+    stats.pool = pool
+    _registry[name] = stats
+    idle_ping = settings.DB_POOL_PRE_PING == "idle"
+    idle_seconds = settings.DB_POOL_PRE_PING_IDLE_SECONDS
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        stats.incr("connects")
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.incr("checkouts")
+        last_checkin = connection_record.info.get("checked_in_at")
+        if not idle_ping or last_checkin is None or time.monotonic() - last_checkin < idle_seconds:
+            return
+        # Ping only connections that sat idle long enough to have been dropped
+        stats.incr("pings")
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        except Exception:
+            stats.incr("ping_failures")
+            # Makes the pool discard this connection and retry with a new one
+            raise exc.DisconnectionError()
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        stats.incr("checkins")
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        stats.incr("invalidations")
+
+    @event.listens_for(engine, "soft_invalidate")
+    def on_soft_invalidate(dbapi_connection, connection_record, exception):
+        stats.incr("soft_invalidations")
+
+    return stats
+
+
+def snapshot() -> dict:
+    return {name: stats.snapshot() for name, stats in _registry.items()}
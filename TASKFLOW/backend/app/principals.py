@@ -0,0 +1,96 @@
+"""
+In-process cache of authenticated principals.
+
+Access tokens carry the user id and ``token_version`` as claims, so
+``deps.get_current_user`` can resolve the caller from this cache without
+touching the database. Entries expire after ``PRINCIPAL_CACHE_TTL_SECONDS``
+and are dropped immediately in this process when the user changes; other
+workers pick the change up once their entry expires.
+
+Bumping ``User.token_version`` revokes every token minted before the bump.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from .config import settings
+from .models import User
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Read-only snapshot of the authenticated user."""
+    id: int
+    email: str
+    full_name: Optional[str]
+    is_admin: bool
+    role: str
+    is_suspended: bool
+    created_at: Optional[datetime]
+    token_version: int
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            full_name=user.full_name,
+            is_admin=bool(user.is_admin),
+            role=user.role,
+            is_suspended=bool(user.is_suspended),
+            created_at=user.created_at,
+            token_version=user.token_version or 0,
+        )
+
+
+class PrincipalCache:
+    """Thread-safe TTL + LRU cache keyed by (user id, token_version)."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, tuple[float, Principal]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, token_version: int) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, principal = entry
+            if expires_at < time.monotonic() or principal.token_version != token_version:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return principal
+
+    def put(self, principal: Principal) -> Principal:
+        if self.maxsize <= 0:
+            return principal
+        with self._lock:
+            self._entries[principal.id] = (time.monotonic() + self.ttl, principal)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return principal
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
+
+def revoke_tokens(user: User):
+    """Invalidate every access token issued to the user so far. Not committed."""
+    user.token_version = (user.token_version or 0) + 1
@@ -0,0 +1,426 @@
+"""
+Request profiling: on-demand sampling profiles and N+1 query detection.
+
+Profiles. An admin sends ``X-Profile: 1`` with any request; it runs under a
+sampling profiler and the response carries ``X-Profile-Id``; the header is
+ignored on anyone else's requests. A background
+thread samples every ``PROFILE_INTERVAL_MS`` whatever is working on that
+request: the event loop while the request's task runs, worker threads
+while it waits on them (``in_thread``), otherwise the coroutine chain it is
+suspended in, ending in ``[await]``. So the profile is wall-clock time of
+this request only, even with other requests in flight. Stacks are stored
+folded (one ``frame;frame;frame count`` line per stack, the input of
+flamegraph.pl and speedscope) in Redis, or in process memory without it, and
+downloaded as SVG or folded text from /api/v1/admin/profiles.
+
+N+1 detection (development). With ``N_PLUS_ONE_DETECTION`` set to "log" or
+"raise", cursor hooks count the SELECTs of each request by shape (the SQL
+with its bound parameters, IN lists collapsed). A shape repeated
+``N_PLUS_ONE_THRESHOLD`` times is logged when the request ends, or raises
+``NPlusOneError`` from the offending statement.
+"""
+import asyncio
+import functools
+import html
+import json
+import logging
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+from fastapi import HTTPException, status
+from sqlalchemy import event
+from starlette.datastructures import Headers
+from .config import settings
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_KEY_PREFIX = "taskflow:profile:"
+PROFILE_INDEX_KEY = "taskflow:profiles"
+N_PLUS_ONE_MODES = ("off", "log", "raise")
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_IN_LIST = re.compile(r"\bIN \([^()]*\)", re.IGNORECASE)
+_sampler: ContextVar[Optional["Sampler"]] = ContextVar("taskflow_profile_sampler", default=None)
+_query_shapes: ContextVar[Optional["QueryShapes"]] = ContextVar("taskflow_query_shapes", default=None)
+_memory_profiles: "OrderedDict[str, tuple[float, dict, str]]" = OrderedDict()
+
+
+# ==================== SAMPLING ====================
+
+@functools.lru_cache(maxsize=None)
+def _short_path(filename: str) -> str:
+    if filename.startswith(APP_DIR):
+        return "app" + filename[len(APP_DIR):]
+    _, marker, rest = filename.rpartition("site-packages" + os.sep)
+    return rest if marker else os.path.basename(filename)
+
+
+@functools.lru_cache(maxsize=None)
+def _frame_label(code) -> str:
+    # ';' separates frames in the folded format
+    return f"{code.co_qualname} ({_short_path(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _await_chain(coro) -> list:
+    """Frames of a coroutine and of everything it is awaiting, outermost first."""
+    frames = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return frames
+
+
+def _thread_stack(frame, stop_code=None, stop_frame=None) -> list:
+    """Frames of a thread's stack below ``stop_code``/``stop_frame``, outermost first."""
+    frames = []
+    while frame is not None:
+        if frame.f_code is stop_code:
+            break
+        frames.append(frame)
+        if frame is stop_frame:
+            break
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+def _run_marked(sampler: "Sampler", fn, *args, **kwargs):
+    ident = threading.get_ident()
+    sampler.threads.add(ident)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        sampler.threads.discard(ident)
+
+
+def in_thread(fn):
+    """
+    Wrap ``fn`` before handing it to a worker thread, so that a profiled
+    request samples the thread while it runs; ``fn`` itself otherwise.
+    """
+    sampler = _sampler.get()
+    if sampler is None:
+        return fn
+    return functools.partial(_run_marked, sampler, fn)
+
+
+class Sampler:
+    """Samples the stacks working on one request from a background thread."""
+
+    def __init__(self, task, interval: float):
+        self.task = task
+        self.loop = task.get_loop()
+        self.loop_thread = threading.get_ident()
+        self.interval = interval
+        # Worker threads currently running code for the request
+        self.threads: set[int] = set()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="taskflow-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        # Sample on a fixed schedule: waiting for the GIL delays a sample, not the next ones
+        deadline = time.monotonic()
+        while True:
+            deadline = max(deadline + self.interval, time.monotonic())
+            if self._stopped.wait(deadline - time.monotonic()):
+                return
+            try:
+                self.sample()
+            except Exception:
+                logger.exception("Profiler sample failed")
+
+    def sample(self):
+        frames = sys._current_frames()
+        awaiting = _await_chain(self.task.get_coro())
+        running = getattr(asyncio.tasks, "_current_tasks", {}).get(self.loop)
+        stacks = []
+        for ident in tuple(self.threads):
+            if ident in frames:
+                # The request's awaits lead to the worker thread's own stack
+                stacks.append(awaiting + _thread_stack(frames[ident], stop_code=_run_marked.__code__))
+        if not stacks and running is self.task and awaiting:
+            stacks.append(_thread_stack(frames.get(self.loop_thread), stop_frame=awaiting[0]))
+        if not stacks:
+            stacks.append(awaiting + [None])
+
+        if self._stopped.is_set():
+            return
+        self.samples += 1
+        for stack in stacks:
+            self.stacks[";".join(
+                "[await]" if frame is None else _frame_label(frame.f_code) for frame in stack
+            )] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+# ==================== STORAGE ====================
+
+async def save_profile(meta: dict, folded: str):
+    _memory_profiles[meta["id"]] = (time.monotonic(), meta, folded)
+    while len(_memory_profiles) > settings.PROFILE_HISTORY:
+        _memory_profiles.popitem(last=False)
+    redis = await get_redis()
+    if redis is not None:
+        try:
+            ttl = settings.PROFILE_TTL_SECONDS
+            await redis.set(PROFILE_KEY_PREFIX + meta["id"], json.dumps({"meta": meta, "stacks": folded}), ex=ttl)
+            await redis.lpush(PROFILE_INDEX_KEY, json.dumps(meta))
+            await redis.ltrim(PROFILE_INDEX_KEY, 0, settings.PROFILE_HISTORY - 1)
+            await redis.expire(PROFILE_INDEX_KEY, ttl)
+        except Exception as exc:
+            logger.warning("Could not store profile in Redis: %s", exc)
+
+
+def _memory_entries():
+    expired = time.monotonic() - settings.PROFILE_TTL_SECONDS
+    return [(meta, folded) for stored, meta, folded in reversed(_memory_profiles.values()) if stored > expired]
+
+
+async def list_profiles() -> list[dict]:
+    """Metadata of the most recent profiles, newest first."""
+    redis = await get_redis()
+    if redis is not None:
+        try:
+            return [json.loads(raw) for raw in await redis.lrange(PROFILE_INDEX_KEY, 0, -1)]
+        except Exception as exc:
+            logger.warning("Could not read profiles from Redis: %s", exc)
+    return [meta for meta, _ in _memory_entries()]
+
+
+async def load_profile(profile_id: str) -> Optional[tuple[dict, str]]:
+    """(metadata, folded stacks) of a stored profile, None if unknown or expired."""
+    redis = await get_redis()
+    if redis is not None:
+        try:
+            raw = await redis.get(PROFILE_KEY_PREFIX + profile_id)
+            if raw:
+                data = json.loads(raw)
+                return data["meta"], data["stacks"]
+        except Exception as exc:
+            logger.warning("Could not read profile from Redis: %s", exc)
+    for meta, folded in _memory_entries():
+        if meta["id"] == profile_id:
+            return meta, folded
+    return None
+
+
+# ==================== FLAMEGRAPH ====================
+
+SVG_WIDTH = 1200
+SVG_ROW = 16
+
+
+def render_svg(folded: str, title: str) -> str:
+    """A static flamegraph (root at the bottom, hover for counts) of folded stacks."""
+    root = {"count": 0, "children": {}}
+    for line in folded.splitlines():
+        stack, _, count = line.rpartition(" ")
+        if not stack:
+            continue
+        node = root
+        node["count"] += int(count)
+        for name in stack.split(";"):
+            node = node["children"].setdefault(name, {"count": 0, "children": {}})
+            node["count"] += int(count)
+
+    def depth(node) -> int:
+        return 1 + max((depth(child) for child in node["children"].values()), default=0)
+
+    total = root["count"] or 1
+    height = (depth(root) + 1) * SVG_ROW + 30
+    rects = []
+
+    def walk(node, x: float, level: int):
+        for name, child in sorted(node["children"].items()):
+            width = child["count"] / total * SVG_WIDTH
+            if width >= 0.5:
+                y = height - (level + 1) * SVG_ROW
+                crc = zlib.crc32(name.encode())
+                color = f"rgb({205 + crc % 50},{(crc >> 8) % 230},{(crc >> 16) % 55})"
+                label = html.escape(name)
+                text = name if len(name) * 7 <= width - 6 else name[:max(int((width - 6) / 7) - 2, 0)] + ".."
+                rects.append(
+                    f'<g><title>{label} ({child["count"]} samples, {child["count"] / total:.1%})</title>'
+                    f'<rect x="{x:.1f}" y="{y}" width="{width:.1f}" height="{SVG_ROW - 1}" fill="{color}"/>'
+                    + (f'<text x="{x + 3:.1f}" y="{y + SVG_ROW - 4}">{html.escape(text)}</text>' if width > 20 else "")
+                    + "</g>"
+                )
+                walk(child, x, level + 1)
+            x += width
+
+    walk(root, 0.0, 0)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{SVG_WIDTH}" height="{height}" '
+        f'font-family="monospace" font-size="11">'
+        f'<text x="{SVG_WIDTH / 2}" y="18" text-anchor="middle" font-size="14">{html.escape(title)}</text>'
+        + "".join(rects) + "</svg>\n"
+    )
+
+
+# ==================== N+1 DETECTION ====================
+
+class NPlusOneError(RuntimeError):
+    """A request repeated one SELECT shape N_PLUS_ONE_THRESHOLD times (raise mode)."""
+
+
+def _query_origin() -> str:
+    """Innermost application frame outside this module, e.g. the lazy load's caller."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(APP_DIR) and filename != __file__:
+            return f"{_short_path(filename)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown"
+
+
+class QueryShapes:
+    """SELECT shapes of one request and where each was first repeated too often."""
+
+    def __init__(self):
+        self.counts: dict[str, int] = {}
+        self.flagged: dict[str, str] = {}
+
+    def report(self, scope):
+        for shape, origin in self.flagged.items():
+            logger.warning(
+                "N+1 queries in %s %s: %d x %s (at %s)",
+                scope["method"], scope["path"], self.counts[shape], " ".join(shape.split()), origin,
+            )
+
+
+def track_query_shapes(engine):
+    """Attach the cursor hook counting SELECT shapes per request to a (sync) engine."""
+    if settings.N_PLUS_ONE_DETECTION not in N_PLUS_ONE_MODES:
+        raise ValueError(f"N_PLUS_ONE_DETECTION must be one of {N_PLUS_ONE_MODES}")
+    threshold = settings.N_PLUS_ONE_THRESHOLD
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_shape(conn, cursor, statement, parameters, context, executemany):
+        shapes = _query_shapes.get()
+        if shapes is None or statement.lstrip()[:6].upper() != "SELECT":
+            return
+        shape = _IN_LIST.sub("IN (...)", statement)
+        count = shapes.counts[shape] = shapes.counts.get(shape, 0) + 1
+        if count != threshold:
+            return
+        origin = _query_origin()
+        if settings.N_PLUS_ONE_DETECTION == "raise":
+            raise NPlusOneError(f"{count} x {' '.join(shape.split())} (at {origin})")
+        shapes.flagged[shape] = origin
+
+
+# ==================== MIDDLEWARE ====================
+
+async def _authorize(scope):
+    """The admin principal of the request's bearer token; raises like the routes do."""
+    # Imported here: these modules import the database, which imports this one
+    from .database import session_scope
+    from .deps import authenticate_token
+    from .routers.admin import check_admin
+
+    scheme, _, token = Headers(scope=scope).get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    async with session_scope() as db:
+        principal = await authenticate_token(db, token)
+    return check_admin(principal)
+
+
+class ProfilingMiddleware:
+    """Profiles requests sent with X-Profile by an admin; counts query shapes in development."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] == "http"
+            and settings.PROFILING_ENABLED
+            and any(name == PROFILE_HEADER for name, _ in scope["headers"])
+        ):
+            await self._profile(scope, receive, send)
+        else:
+            await self._call(scope, receive, send)
+
+    async def _call(self, scope, receive, send):
+        if scope["type"] != "http" or settings.N_PLUS_ONE_DETECTION == "off":
+            await self.app(scope, receive, send)
+            return
+        shapes = QueryShapes()
+        token = _query_shapes.set(shapes)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _query_shapes.reset(token)
+            shapes.report(scope)
+
+    async def _profile(self, scope, receive, send):
+        try:
+            admin = await _authorize(scope)
+        except HTTPException:
+            # Not an admin: the header is ignored and the request runs unprofiled
+            await self._call(scope, receive, send)
+            return
+
+        profile_id = secrets.token_hex(8)
+        status_code = 500
+
+        async def send_with_profile_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        sampler = Sampler(asyncio.current_task(), settings.PROFILE_INTERVAL_MS / 1000)
+        token = _sampler.set(sampler)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self._call(scope, receive, send_with_profile_id)
+        finally:
+            sampler.stop()
+            _sampler.reset(token)
+            route = scope.get("route")
+            meta = {
+                "id": profile_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": getattr(route, "path", None),
+                "status_code": status_code,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                "samples": sampler.samples,
+                "interval_ms": settings.PROFILE_INTERVAL_MS,
+                "admin_id": admin.id,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+            }
+            await save_profile(meta, sampler.folded())
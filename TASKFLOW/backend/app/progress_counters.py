@@ -0,0 +1,183 @@
+"""
+Incrementally maintained task counters for the ``progress`` table.
+
+Task writes only ever move a project's counters by a small delta (one task
+created, deleted or moved between statuses), so instead of re-reading every
+task of the project we apply that delta with a single UPDATE in the same
+transaction as the task write.
+
+``rebuild_progress`` recomputes the counters from the ``tasks`` table with one
+grouped aggregate query and is exposed as a reconciliation command:
+
+    python -m app.progress_counters [--project-id ID ...]
+
+Migration 0001b fills the counters in once for existing databases; run the
+command after any write that bypasses the deltas (e.g. manual SQL).
+"""
+import argparse
+from typing import Iterable, Optional
+from sqlalchemy import case, func, select, update
+from sqlalchemy.orm import Session
+from .models import Progress, Project, Task, TaskStatus
+
+# Progress column holding the counter for each task status
+STATUS_COLUMNS = {
+    TaskStatus.TODO: "todo_tasks",
+    TaskStatus.IN_PROGRESS: "in_progress_tasks",
+    TaskStatus.DONE: "done_tasks",
+}
+
+
+def _as_status(value) -> Optional[TaskStatus]:
+    if value is None or isinstance(value, TaskStatus):
+        return value
+    return TaskStatus(value)
+
+
+def completion_percentage(total: int, done: int) -> float:
+    """Percentage of done tasks, 0.0 for an empty project."""
+    return (done / total) * 100 if total else 0.0
+
+
+def status_deltas(old_status=None, new_status=None, count: int = 1) -> dict:
+    """Per-status counter deltas for moving ``count`` tasks between statuses."""
+    old_status, new_status = _as_status(old_status), _as_status(new_status)
+    deltas = {}
+    if old_status == new_status:
+        return deltas
+    if old_status is not None:
+        deltas[old_status] = -count
+    if new_status is not None:
+        deltas[new_status] = count
+    return deltas
+
+
+def apply_status_delta(db: Session, project_id: int, old_status=None, new_status=None, count: int = 1):
+    """
+    Move ``count`` tasks of a project from ``old_status`` to ``new_status``.
+
+    ``old_status=None`` means the tasks were created, ``new_status=None`` means
+    they were deleted. The change is issued as one UPDATE on the progress row and
+    is not committed: the caller commits it together with the task write.
+    Returns the updated counters, as ``apply_counter_deltas``.
+    """
+    return apply_counter_deltas(db, project_id, status_deltas(old_status, new_status, count))
+
+
+def apply_counter_deltas(db: Session, project_id: int, deltas: dict) -> Optional[dict]:
+    """
+    Apply net per-status deltas (``{TaskStatus: +n/-n}``) to a project's
+    counters with a single UPDATE. Does not commit.
+
+    Returns the counters after the update (read back with RETURNING), or None
+    when nothing changed or the progress row had to be rebuilt.
+    """
+    deltas = {
+        STATUS_COLUMNS[_as_status(task_status)]: delta
+        for task_status, delta in deltas.items()
+        if delta
+    }
+    if not deltas:
+        return None
+    total_delta = sum(deltas.values())
+
+    new_total = Progress.total_tasks + total_delta
+    new_done = Progress.done_tasks + deltas.get("done_tasks", 0)
+    values = {
+        getattr(Progress, column): getattr(Progress, column) + delta
+        for column, delta in deltas.items()
+    }
+    values[Progress.total_tasks] = new_total
+    values[Progress.completion_percentage] = case(
+        (new_total > 0, new_done * 100.0 / new_total),
+        else_=0.0,
+    )
+
+    row = db.execute(
+        update(Progress)
+        .where(Progress.project_id == project_id)
+        .values(values)
+        .returning(
+            Progress.project_id, Progress.total_tasks, Progress.todo_tasks,
+            Progress.in_progress_tasks, Progress.done_tasks, Progress.completion_percentage,
+        )
+        .execution_options(synchronize_session=False)
+    ).mappings().first()
+    if row is None:
+        # Legacy project without a progress row: build it from the tasks table
+        db.flush()
+        rebuild_progress(db, [project_id])
+        return None
+    return dict(row)
+
+
+def rebuild_progress(db: Session, project_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Recompute the counters of the given projects (all projects by default)
+    from the tasks table. Returns the number of progress rows written.
+    Does not commit.
+    """
+    ids = list(project_ids) if project_ids is not None else None
+
+    counts_query = (
+        select(Project.id, Task.status, func.count(Task.id))
+        .select_from(Project)
+        .outerjoin(Task, Task.project_id == Project.id)
+        .group_by(Project.id, Task.status)
+    )
+    if ids is not None:
+        counts_query = counts_query.where(Project.id.in_(ids))
+
+    counters = {}
+    for project_id, task_status, task_count in db.execute(counts_query):
+        row = counters.setdefault(project_id, {column: 0 for column in STATUS_COLUMNS.values()})
+        if task_status is not None:
+            row[STATUS_COLUMNS[_as_status(task_status)]] += task_count
+    if not counters:
+        return 0
+
+    for row in counters.values():
+        row["total_tasks"] = sum(row[column] for column in STATUS_COLUMNS.values())
+        row["completion_percentage"] = completion_percentage(row["total_tasks"], row["done_tasks"])
+
+    existing = dict(
+        db.execute(
+            select(Progress.project_id, Progress.id).where(Progress.project_id.in_(counters.keys()))
+        ).all()
+    )
+    updates = [
+        {"id": existing[project_id], **row}
+        for project_id, row in counters.items()
+        if project_id in existing
+    ]
+    inserts = [
+        {"project_id": project_id, **row}
+        for project_id, row in counters.items()
+        if project_id not in existing
+    ]
+    if updates:
+        db.execute(update(Progress), updates)
+    if inserts:
+        db.bulk_insert_mappings(Progress, inserts)
+    return len(counters)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild progress counters from the tasks table")
+    parser.add_argument("--project-id", type=int, action="append", dest="project_ids",
+                        help="Only rebuild this project (repeatable)")
+    args = parser.parse_args(argv)
+
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        written = rebuild_progress(db, args.project_ids)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Rebuilt progress counters for {written} project(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Token-bucket rate limiting.
+
+``RateLimitMiddleware`` charges every API request against one or more
+buckets before it reaches a route:
+
+- login and register: one bucket per client IP and one per account (the
+  submitted email), so credential stuffing is throttled whether it comes
+  from one address or targets one account from many;
+- other /api/ routes: one bucket per user (from the bearer token), or per
+  client IP for anonymous calls.
+
+Buckets live in Redis and are checked and charged in a single Lua script,
+so all workers share them; without Redis each process keeps its own. A
+request is charged only when every bucket has a token left. Responses carry
+RateLimit-Limit / RateLimit-Remaining / RateLimit-Reset for the tightest
+bucket, and 429 responses a Retry-After.
+"""
+import hashlib
+import json
+import logging
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from urllib.parse import parse_qs
+from jose import JWTError, jwt
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from .config import settings
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "taskflow:ratelimit:"
+AUTH_PATHS = {"/api/v1/users/login", "/api/v1/users/register"}
+# Larger bodies are passed through without reading the account
+MAX_AUTH_BODY_BYTES = 64 * 1024
+MAX_MEMORY_BUCKETS = 100_000
+
+# KEYS: bucket keys; ARGV: capacity and refill rate (tokens/second) per key.
+# Returns the allowed flag followed by each bucket's tokens after the call.
+TOKEN_BUCKET_LUA = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local allowed = 1
+local levels = {}
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) / 1000 * rate)
+    if tokens < 1 then
+        allowed = 0
+    end
+    levels[i] = tokens
+end
+local result = {allowed}
+for i, key in ipairs(KEYS) do
+    local tokens = levels[i]
+    if allowed == 1 then
+        local capacity = tonumber(ARGV[2 * i - 1])
+        local rate = tonumber(ARGV[2 * i])
+        tokens = tokens - 1
+        redis.call('HSET', key, 'tokens', tostring(tokens), 'ts', now)
+        redis.call('PEXPIRE', key, math.ceil((capacity - tokens) / rate * 1000) + 1000)
+    end
+    result[i + 1] = tostring(tokens)
+end
+return result
+"""
+
+
+@dataclass(frozen=True)
+class Bucket:
+    key: str
+    capacity: int
+    rate: float  # tokens per second
+
+    @classmethod
+    def per_minute(cls, key: str, burst: int, per_minute: int) -> "Bucket":
+        return cls(KEY_PREFIX + key, max(1, burst), max(1, per_minute) / 60)
+
+
+class MemoryBuckets:
+    """Per-process fallback: LRU of bucket key -> (tokens, timestamp)."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, tuple[float, float]]" = OrderedDict()
+
+    def take(self, buckets: list[Bucket]) -> tuple[bool, list[float]]:
+        now = time.monotonic()
+        levels = []
+        for bucket in buckets:
+            tokens, ts = self._entries.get(bucket.key, (bucket.capacity, now))
+            levels.append(min(bucket.capacity, tokens + (now - ts) * bucket.rate))
+        allowed = all(tokens >= 1 for tokens in levels)
+        if allowed:
+            levels = [tokens - 1 for tokens in levels]
+            for bucket, tokens in zip(buckets, levels):
+                self._entries[bucket.key] = (tokens, now)
+                self._entries.move_to_end(bucket.key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return allowed, levels
+
+    def clear(self):
+        self._entries.clear()
+
+
+memory_buckets = MemoryBuckets(MAX_MEMORY_BUCKETS)
+_scripts = {}
+
+
+async def take(buckets: list[Bucket]) -> tuple[bool, list[float]]:
+    """Charge one token to every bucket if all have one; return the levels."""
+    redis = await get_redis()
+    if redis is not None:
+        try:
+            script = _scripts.get(id(redis))
+            if script is None:
+                script = _scripts[id(redis)] = redis.register_script(TOKEN_BUCKET_LUA)
+            args = [value for bucket in buckets for value in (bucket.capacity, bucket.rate)]
+            result = await script(keys=[bucket.key for bucket in buckets], args=args)
+            return bool(int(result[0])), [float(level) for level in result[1:]]
+        except Exception as exc:
+            logger.warning("Rate limiting without Redis: %s", exc)
+    return memory_buckets.take(buckets)
+
+
+def _client_ip(scope) -> str:
+    if settings.RATE_LIMIT_TRUST_FORWARDED_FOR:
+        forwarded = Headers(scope=scope).get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def _token_subject(scope) -> str | None:
+    """User id (or email for older tokens) of a valid bearer token."""
+    authorization = Headers(scope=scope).get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    subject = payload.get("uid") or payload.get("sub")
+    return str(subject) if subject is not None else None
+
+
+def _submitted_account(path: str, content_type: str, body: bytes) -> str | None:
+    """The email a login form or registration payload is about."""
+    try:
+        if path.endswith("/login") and content_type.startswith("application/x-www-form-urlencoded"):
+            account = parse_qs(body.decode())["username"][0]
+        elif path.endswith("/register") and content_type.startswith("application/json"):
+            account = json.loads(body)["email"]
+        else:
+            return None
+    except (KeyError, IndexError, TypeError, ValueError):
+        return None
+    if not isinstance(account, str) or not account.strip():
+        return None
+    return hashlib.sha256(account.strip().lower().encode()).hexdigest()[:32]
+
+
+async def _read_body(receive) -> tuple[bytes, list, bool]:
+    """Buffer the request body up to MAX_AUTH_BODY_BYTES for replay."""
+    messages, size = [], 0
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            return b"", messages, False
+        size += len(message.get("body", b""))
+        if size > MAX_AUTH_BODY_BYTES:
+            return b"", messages, False
+        if not message.get("more_body", False):
+            return b"".join(m.get("body", b"") for m in messages), messages, True
+
+
+def _replay(messages, receive):
+    pending = list(messages)
+
+    async def replay():
+        if pending:
+            return pending.pop(0)
+        return await receive()
+
+    return replay
+
+
+def _headers(buckets: list[Bucket], levels: list[float], allowed: bool) -> dict:
+    tightest = min(range(len(buckets)), key=lambda i: levels[i] / buckets[i].capacity)
+    bucket, tokens = buckets[tightest], levels[tightest]
+    headers = {
+        "RateLimit-Limit": str(bucket.capacity),
+        "RateLimit-Remaining": str(max(0, math.floor(tokens))),
+        "RateLimit-Reset": str(math.ceil((bucket.capacity - tokens) / bucket.rate)),
+    }
+    if not allowed:
+        wait = max((1 - level) / b.rate for b, level in zip(buckets, levels) if level < 1)
+        headers["Retry-After"] = str(max(1, math.ceil(wait)))
+    return headers
+
+
+class RateLimitMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not settings.RATE_LIMIT_ENABLED
+            or scope["method"] == "OPTIONS"
+            or not scope["path"].startswith("/api/")
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"].rstrip("/")
+        ip = _client_ip(scope)
+        if path in AUTH_PATHS and scope["method"] == "POST":
+            buckets = [Bucket.per_minute(
+                f"ip:{ip}", settings.RATE_LIMIT_AUTH_IP_BURST, settings.RATE_LIMIT_AUTH_IP_PER_MINUTE
+            )]
+            body, messages, complete = await _read_body(receive)
+            receive = _replay(messages, receive)
+            content_type = Headers(scope=scope).get("content-type", "")
+            account = _submitted_account(path, content_type, body) if complete else None
+            if account is not None:
+                buckets.append(Bucket.per_minute(
+                    f"account:{account}", settings.RATE_LIMIT_AUTH_ACCOUNT_BURST,
+                    settings.RATE_LIMIT_AUTH_ACCOUNT_PER_MINUTE,
+                ))
+        else:
+            subject = _token_subject(scope)
+            key = f"user:{subject}" if subject is not None else f"ip:{ip}:api"
+            buckets = [Bucket.per_minute(key, settings.RATE_LIMIT_API_BURST, settings.RATE_LIMIT_API_PER_MINUTE)]
+
+        allowed, levels = await take(buckets)
+        headers = _headers(buckets, levels, allowed)
+        if not allowed:
+            response = JSONResponse({"detail": "Too many requests"}, status_code=429, headers=headers)
+            await response(scope, receive, send)
+            return
+
+        raw_headers = [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + raw_headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
@@ -0,0 +1,59 @@
+"""
+Shared asyncio Redis client.
+
+Redis is optional: ``get_redis()`` returns None when REDIS_URL is empty or
+the server does not answer, and callers fall back to in-process state. An
+unreachable server is probed again after ``REDIS_RETRY_SECONDS``.
+"""
+import asyncio
+import logging
+import time
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_next_probe = 0.0
+_lock = None
+
+
+async def get_redis():
+    """Return the shared client, or None when Redis is not available."""
+    global _client, _next_probe, _lock
+    if _client is not None or not settings.REDIS_URL:
+        return _client
+    if time.monotonic() < _next_probe:
+        return None
+    if _lock is None:
+        _lock = asyncio.Lock()
+
+    async with _lock:
+        if _client is not None or time.monotonic() < _next_probe:
+            return _client
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            _next_probe = float("inf")
+            return None
+
+        client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT_SECONDS,
+        )
+        try:
+            await client.ping()
+        except Exception as exc:
+            logger.warning("Redis unavailable at %s (%s); using in-process fallback", settings.REDIS_URL, exc)
+            _next_probe = time.monotonic() + settings.REDIS_RETRY_SECONDS
+            await client.close()
+            return None
+        _client = client
+        return _client
+
+
+async def close_redis():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
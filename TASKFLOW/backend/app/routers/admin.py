@@ -1,27 +1,35 @@
 from datetime import datetime, timedelta
+from typing import Literal
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, func
-from ..database import get_db
-from ..models import User, Project, Task, AdminLog, TaskStatus
-from ..schemas import UserResponse, ProjectResponse, AdminLogResponse, AdminStatsResponse
+from sqlalchemy import desc, case, func, select
+from ..database import get_db, db_handler, run_with_session
+from ..models import User, Project, Task, TaskStatus, Progress, AdminLog
+from ..schemas import (
+    UserResponse, ProjectResponse, AdminLogResponse, AdminStatsResponse,
+    UsersListResponse, TasksListResponse, AdminLogsListResponse,
+    AdminProjectResponse, AdminProjectsListResponse, ProjectOwner,
+)
+from ..pagination import paginate
+from ..counts import CountMode
 from ..deps import get_current_user
-import json
+from ..auth import hash_password
+from ..principals import principal_cache, revoke_tokens
+from ..csv_export import stream_csv
+from ..task_changes import bump_task_project, record_tombstones
+from ..events import publish_after_commit, task_deleted_event, progress_event
+from ..progress_counters import apply_status_delta
+from ..serialization import json_response
+from ..audit import audit_log
+from .. import admin_stats, pool_stats, profiling
 
 router = APIRouter()
 
 
 def log_admin_action(db: Session, admin_id: int, action: str, target_type: str, target_id: int, details: dict = None):
-    """Helper to log admin actions"""
-    log = AdminLog(
-        admin_id=admin_id,
-        action=action,
-        target_type=target_type,
-        target_id=target_id,
-        details=json.dumps(details) if details else None
-    )
-    db.add(log)
-    db.commit()
+    """Log an admin action; it is written by the commit of the action itself (see app.audit)"""
+    audit_log(db).add(admin_id, action, target_type, target_id, details)
 
 
 def check_admin(current_user: User) -> User:
@@ -34,48 +42,38 @@ def check_admin(current_user: User) -> User:
 # ==================== STATS ====================
 
 @router.get("/stats", response_model=AdminStatsResponse)
-def get_admin_stats(
+async def get_admin_stats(
+    refresh: bool = Query(False),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get admin dashboard stats"""
+    """Get admin dashboard stats (precomputed snapshot, see app.admin_stats)"""
     admin = check_admin(current_user)
     
-    total_users = db.query(User).count()
-    total_projects = db.query(Project).count()
-    total_tasks = db.query(Task).count()
-    
-    recent_users = db.query(User).order_by(desc(User.created_at)).limit(5).all()
-    recent_projects = db.query(Project).order_by(desc(Project.created_at)).limit(5).all()
-    # Additional stats: tasks completed today and tasks due today
-    from datetime import datetime, timezone
-    today = datetime.now(timezone.utc).date()
-    tasks_completed_today = db.query(Task).filter(
-        Task.status == TaskStatus.DONE,
-        func.date(Task.updated_at) == today
-    ).count()
-    tasks_due_today = db.query(Task).filter(
-        func.date(Task.due_date) == today
-    ).count()
-
-    return {
-        "total_users": total_users,
-        "total_projects": total_projects,
-        "total_tasks": total_tasks,
-        "recent_users": recent_users,
-        "recent_projects": recent_projects,
-        "tasks_completed_today": tasks_completed_today,
-        "tasks_due_today": tasks_due_today
-    }
+    snapshot = None if refresh else await admin_stats.load_snapshot()
+    if snapshot is None:
+        snapshot = await admin_stats.refresh(db)
+    return admin_stats.with_staleness(snapshot)
+
+
+@router.get("/db-pool")
+async def get_db_pool_stats(current_user: User = Depends(get_current_user)):
+    """Connection pool statistics of this worker (admin only)"""
+    check_admin(current_user)
+    return pool_stats.snapshot()
 
 
 # ==================== USERS ====================
 
-@router.get("/users", response_model=dict)
+@router.get("/users", response_model=UsersListResponse)
+@db_handler
 def list_all_users(
     q: str = Query(None),
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=200),
+    cursor: str | None = Query(None),
+    include_total: bool | None = Query(None),
+    count_mode: CountMode = Query(CountMode.EXACT),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -87,18 +85,11 @@ def list_all_users(
         like = f"%{q}%"
         query = query.filter((User.email.ilike(like)) | (User.full_name.ilike(like)))
     
-    total = query.count()
-    users = query.order_by(desc(User.created_at)).offset((page - 1) * per_page).limit(per_page).all()
-    
-    return {
-        "items": users,
-        "total": total,
-        "page": page,
-        "per_page": per_page
-    }
+    return json_response(UsersListResponse, paginate(query, User, page, per_page, cursor, include_total, count_mode))
 
 
 @router.patch("/users/{user_id}/admin", response_model=UserResponse)
+@db_handler
 def toggle_user_admin(
     user_id: int,
     is_admin: bool,
@@ -113,16 +104,18 @@ def toggle_user_admin(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     
     user.is_admin = is_admin
+    revoke_tokens(user)
     db.add(user)
+    log_admin_action(db, admin.id, "admin_toggle", "user", user_id, {"is_admin": is_admin})
     db.commit()
     db.refresh(user)
-    
-    log_admin_action(db, admin.id, "admin_toggle", "user", user_id, {"is_admin": is_admin})
+    principal_cache.invalidate(user_id)
     
     return user
 
 
 @router.patch("/users/{user_id}/suspend", response_model=UserResponse)
+@db_handler
 def suspend_user(
     user_id: int,
     is_suspended: bool,
@@ -137,42 +130,48 @@ def suspend_user(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     
     user.is_suspended = is_suspended
+    revoke_tokens(user)
     db.add(user)
+    log_admin_action(db, admin.id, "suspend_toggle", "user", user_id, {"is_suspended": is_suspended})
     db.commit()
     db.refresh(user)
-    
-    log_admin_action(db, admin.id, "suspend_toggle", "user", user_id, {"is_suspended": is_suspended})
+    principal_cache.invalidate(user_id)
     
     return user
 
 
+def _reset_password(db: Session, admin_id: int, user_id: int, hashed_password: str):
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    
+    user.hashed_password = hashed_password
+    revoke_tokens(user)
+    db.add(user)
+    log_admin_action(db, admin_id, "password_reset", "user", user_id, {})
+    db.commit()
+    db.refresh(user)
+    principal_cache.invalidate(user_id)
+
+
 @router.post("/users/{user_id}/reset-password")
-def reset_user_password(
+async def reset_user_password(
     user_id: int,
     new_password: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Reset a user's password (admin only)"""
-    from ..auth import get_password_hash
-    
     admin = check_admin(current_user)
     
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-    
-    user.hashed_password = get_password_hash(new_password)
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    
-    log_admin_action(db, admin.id, "password_reset", "user", user_id, {})
+    hashed_password = await hash_password(new_password)
+    await run_with_session(db, _reset_password, admin.id, user_id, hashed_password)
     
     return {"message": "Password reset successfully"}
 
 
 @router.delete("/users/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
+@db_handler
 def delete_user_admin(
     user_id: int,
     db: Session = Depends(get_db),
@@ -189,46 +188,100 @@ def delete_user_admin(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     
     db.delete(user)
-    db.commit()
-    
     log_admin_action(db, admin.id, "user_deleted", "user", user_id, {"email": user.email})
+    db.commit()
+    principal_cache.invalidate(user_id)
 
 
 # ==================== PROJECTS ====================
 
-@router.get("/projects", response_model=dict)
+def _with_owner_and_task_counts(query, project):
+    """Join the owner and the page's per-status task counts in one statement."""
+    def status_count(task_status: TaskStatus):
+        return func.sum(case((Task.status == task_status, 1), else_=0))
+
+    counts = (
+        select(
+            Task.project_id,
+            func.count(Task.id).label("task_count"),
+            status_count(TaskStatus.TODO).label("todo_count"),
+            status_count(TaskStatus.IN_PROGRESS).label("in_progress_count"),
+            status_count(TaskStatus.DONE).label("done_count"),
+        )
+        .where(Task.project_id.in_(select(project.id)))
+        .group_by(Task.project_id)
+        .subquery()
+    )
+    task_count = func.coalesce(counts.c.task_count, 0)
+    done_count = func.coalesce(counts.c.done_count, 0)
+    return (
+        query.join(User, User.id == project.owner_id)
+        .outerjoin(counts, counts.c.project_id == project.id)
+        .add_columns(
+            User,
+            task_count.label("task_count"),
+            func.coalesce(counts.c.todo_count, 0).label("todo_count"),
+            func.coalesce(counts.c.in_progress_count, 0).label("in_progress_count"),
+            done_count.label("done_count"),
+            case((task_count > 0, done_count * 100.0 / task_count), else_=0.0).label("completion_percentage"),
+        )
+    )
+
+
+@router.get("/projects", response_model=AdminProjectsListResponse)
+@db_handler
 def list_all_projects(
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=200),
+    cursor: str | None = Query(None),
+    include_total: bool | None = Query(None),
+    count_mode: CountMode = Query(CountMode.EXACT),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """List all projects (admin only)"""
+    """List all projects with owner and task counts (admin only)"""
     admin = check_admin(current_user)
     
-    query = db.query(Project)
-    total = query.count()
-    projects = query.order_by(desc(Project.created_at)).offset((page - 1) * per_page).limit(per_page).all()
-    
-    # Add task count to each project
-    result = []
-    for proj in projects:
-        task_count = db.query(Task).filter(Task.project_id == proj.id).count()
-        result.append({
-            **proj.__dict__,
-            "task_count": task_count,
-            "owner": proj.owner
-        })
+    result_page = paginate(
+        db.query(Project), Project, page, per_page, cursor, include_total, count_mode,
+        expand=_with_owner_and_task_counts,
+    )
     
-    return {
-        "items": result,
-        "total": total,
-        "page": page,
-        "per_page": per_page
-    }
+    items = [
+        AdminProjectResponse(
+            **ProjectResponse.model_validate(row[0]).model_dump(),
+            owner=ProjectOwner.model_validate(row.User),
+            task_count=row.task_count,
+            todo_count=row.todo_count,
+            in_progress_count=row.in_progress_count,
+            done_count=row.done_count,
+            completion_percentage=row.completion_percentage,
+        )
+        for row in result_page["items"]
+    ]
+    return {**result_page, "items": items}
+
+
+@router.get("/projects/export", response_class=StreamingResponse)
+async def export_projects_csv(gzip: bool = Query(False), current_user: User = Depends(get_current_user)):
+    """Export all projects with owner and task counters as CSV, streamed (admin only)"""
+    check_admin(current_user)
+    statement = select(
+        Project.id, Project.name, Project.description, Project.owner_id, User.email,
+        Progress.total_tasks, Progress.done_tasks, Progress.completion_percentage,
+        Project.created_at, Project.updated_at,
+    ).join(User, User.id == Project.owner_id).outerjoin(
+        Progress, Progress.project_id == Project.id
+    ).order_by(Project.id)
+    header = [
+        "id", "name", "description", "owner_id", "owner_email",
+        "total_tasks", "done_tasks", "completion_percentage", "created_at", "updated_at",
+    ]
+    return stream_csv(statement, header, "projects.csv", gzip)
 
 
 @router.delete("/projects/{project_id}", status_code=status.HTTP_204_NO_CONTENT)
+@db_handler
 def delete_project_admin(
     project_id: int,
     db: Session = Depends(get_db),
@@ -242,14 +295,14 @@ def delete_project_admin(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
     
     db.delete(project)
-    db.commit()
-    
     log_admin_action(db, admin.id, "project_deleted", "project", project_id, {"name": project.name})
+    db.commit()
 
 
 # ==================== TASKS ====================
 
 @router.get("/projects/{project_id}/tasks")
+@db_handler
 def get_project_tasks(
     project_id: int,
     db: Session = Depends(get_db),
@@ -266,23 +319,42 @@ def get_project_tasks(
     return {"items": tasks}
 
 
-@router.get("/tasks", response_model=dict)
+@router.get("/tasks", response_model=TasksListResponse)
+@db_handler
 def list_all_tasks(
     page: int = Query(1, ge=1),
     per_page: int = Query(100, ge=1, le=1000),
+    cursor: str | None = Query(None),
+    include_total: bool | None = Query(None),
+    count_mode: CountMode = Query(CountMode.EXACT),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """List all tasks across projects (admin only)"""
     admin = check_admin(current_user)
 
-    query = db.query(Task)
-    total = query.count()
-    tasks = query.order_by(desc(Task.created_at)).offset((page - 1) * per_page).limit(per_page).all()
-    return {"items": tasks, "total": total, "page": page, "per_page": per_page}
+    return json_response(
+        TasksListResponse, paginate(db.query(Task), Task, page, per_page, cursor, include_total, count_mode)
+    )
+
+
+@router.get("/tasks/export", response_class=StreamingResponse)
+async def export_tasks_csv(gzip: bool = Query(False), current_user: User = Depends(get_current_user)):
+    """Export all tasks as CSV, streamed (admin only)"""
+    check_admin(current_user)
+    statement = select(
+        Task.id, Task.project_id, Task.title, Task.description, Task.status, Task.priority,
+        Task.due_date, Task.scheduled_day, Task.version, Task.created_at, Task.updated_at,
+    ).order_by(Task.id)
+    header = [
+        "id", "project_id", "title", "description", "status", "priority",
+        "due_date", "scheduled_day", "version", "created_at", "updated_at",
+    ]
+    return stream_csv(statement, header, "tasks.csv", gzip)
 
 
 @router.delete("/tasks/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
+@db_handler
 def delete_task_admin(
     task_id: int,
     db: Session = Depends(get_db),
@@ -291,35 +363,67 @@ def delete_task_admin(
     """Delete a task (admin only)"""
     admin = check_admin(current_user)
     
+    # Takes the project's next change sequence for the tombstone
+    stamp = bump_task_project(db, task_id)
     task = db.query(Task).filter(Task.id == task_id).first()
-    if not task:
+    if not task or stamp is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
     
+    record_tombstones(db, [(task_id, *stamp)])
+    progress = apply_status_delta(db, task.project_id, task.status, None)
     db.delete(task)
-    db.commit()
-    
     log_admin_action(db, admin.id, "task_deleted", "task", task_id, {"title": task.title})
+    db.commit()
+    publish_after_commit(*stamp, [task_deleted_event(task_id), *progress_event(progress)])
 
 
 # ==================== LOGS ====================
 
-@router.get("/logs", response_model=dict)
+@router.get("/logs", response_model=AdminLogsListResponse)
+@db_handler
 def get_admin_logs(
     page: int = Query(1, ge=1),
     per_page: int = Query(50, ge=1, le=200),
+    cursor: str | None = Query(None),
+    include_total: bool | None = Query(None),
+    count_mode: CountMode = Query(CountMode.EXACT),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get admin activity logs (admin only)"""
     admin = check_admin(current_user)
     
-    query = db.query(AdminLog)
-    total = query.count()
-    logs = query.order_by(desc(AdminLog.created_at)).offset((page - 1) * per_page).limit(per_page).all()
-    
-    return {
-        "items": logs,
-        "total": total,
-        "page": page,
-        "per_page": per_page
-    }
+    return json_response(
+        AdminLogsListResponse,
+        paginate(db.query(AdminLog), AdminLog, page, per_page, cursor, include_total, count_mode),
+    )
+
+
+# ==================== PROFILES ====================
+
+@router.get("/profiles")
+async def list_request_profiles(current_user: User = Depends(get_current_user)):
+    """Recent request profiles, newest first (admin only; send X-Profile: 1 to record one)"""
+    check_admin(current_user)
+    return await profiling.list_profiles()
+
+
+@router.get("/profiles/{profile_id}")
+async def download_request_profile(
+    profile_id: str,
+    format: Literal["svg", "folded"] = Query("svg"),
+    current_user: User = Depends(get_current_user)
+):
+    """Download a request profile as a flamegraph SVG or folded stacks (admin only)"""
+    check_admin(current_user)
+    
+    profile = await profiling.load_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    meta, folded = profile
+    
+    headers = {"Content-Disposition": f'attachment; filename="profile-{profile_id}.{format}"'}
+    if format == "folded":
+        return PlainTextResponse(folded, headers=headers)
+    title = f"{meta['method']} {meta['path']} ({meta['status_code']}): {meta['duration_ms']} ms, {meta['samples']} samples"
+    return Response(profiling.render_svg(folded, title), media_type="image/svg+xml", headers=headers)
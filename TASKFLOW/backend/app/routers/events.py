@@ -0,0 +1,93 @@
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request, WebSocket, status
+from fastapi.responses import StreamingResponse
+from ..config import settings
+from ..database import session_scope, run_with_session
+from ..deps import authenticate_token, load_owned_project
+from ..events import broker
+
+router = APIRouter()
+
+
+def _bearer_token(headers, token: Optional[str]) -> str:
+    """Token from the ``token`` query parameter (EventSource and browser
+    WebSockets cannot set headers) or the Authorization header."""
+    if token:
+        return token
+    scheme, _, value = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not value:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return value
+
+
+async def _authorize(token: str, project_id: int):
+    """
+    Same token check as get_current_user, plus ownership. Uses its own short
+    session so an open stream does not hold a database connection.
+    """
+    async with session_scope() as db:
+        principal = await authenticate_token(db, token)
+        project = await run_with_session(db, load_owned_project, project_id, principal.id)
+    if not project:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
+
+
+@router.get("/projects/{project_id}/stream")
+async def project_event_stream(project_id: int, request: Request, token: Optional[str] = None):
+    """Server-sent events for a project's tasks and progress"""
+    await _authorize(_bearer_token(request.headers, token), project_id)
+
+    async def events():
+        queue = await broker.subscribe(project_id)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), settings.EVENT_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {message}\n\n"
+        finally:
+            await broker.unsubscribe(project_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/projects/{project_id}/ws")
+async def project_event_socket(websocket: WebSocket, project_id: int, token: Optional[str] = None):
+    """WebSocket stream of a project's task and progress events"""
+    try:
+        await _authorize(_bearer_token(websocket.headers, token), project_id)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    queue = await broker.subscribe(project_id)
+
+    async def forward():
+        while True:
+            await websocket.send_text(await queue.get())
+
+    async def wait_for_close():
+        # Clients do not send anything; reading only notices the disconnect
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    tasks = [asyncio.create_task(forward()), asyncio.create_task(wait_for_close())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await broker.unsubscribe(project_id, queue)
@@ -1,52 +1,56 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, Response
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import List
-from ..database import get_db
+from typing import List, Optional
+from ..database import get_db, db_handler
 from ..models import Progress, Project, User
 from ..schemas import ProgressResponse
-from ..deps import get_current_user
+from ..deps import get_current_user, get_owned_progress
+from ..etags import weak_etag, etag_matches, not_modified, set_etag
+from ..serialization import json_response
+from ..progress_counters import rebuild_progress
 
 router = APIRouter()
 
 
 @router.get("/project/{project_id}", response_model=ProgressResponse)
+@db_handler
 def get_progress(
-    project_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    owned: tuple = Depends(get_owned_progress),
+    db: Session = Depends(get_db)
 ):
     """Get progress for a specific project"""
-    # Verify project ownership
-    project = db.query(Project).filter(
-        Project.id == project_id,
-        Project.owner_id == current_user.id
-    ).first()
-    
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    progress = db.query(Progress).filter(Progress.project_id == project_id).first()
+    project, progress = owned
     
     if not progress:
-        # Create initial progress if it doesn't exist
-        progress = Progress(project_id=project_id, completion_percentage=0.0)
-        db.add(progress)
+        # Legacy project without a progress row: build it from the tasks table
+        rebuild_progress(db, [project.id])
         db.commit()
-        db.refresh(progress)
+        progress = db.query(Progress).filter(Progress.project_id == project.id).one()
     
     return progress
 
 
 @router.get("/", response_model=List[ProgressResponse])
+@db_handler
 def get_all_progress(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get progress for all user's projects"""
-    projects = db.query(Project).filter(Project.owner_id == current_user.id).all()
-    project_ids = [p.id for p in projects]
-    
-    progress_list = db.query(Progress).filter(Progress.project_id.in_(project_ids)).all()
+    """Get progress for all user's projects (ETag / If-None-Match aware)"""
+    owned = db.query(Progress).join(
+        Project, Project.id == Progress.project_id
+    ).filter(Project.owner_id == current_user.id)
+    state = owned.with_entities(
+        func.count(Progress.id), func.max(Progress.id), func.max(Progress.updated_at),
+        func.sum(Progress.total_tasks), func.sum(Progress.done_tasks), func.sum(Progress.in_progress_tasks),
+    ).one()
+    etag = weak_etag("progress", current_user.id, *state)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
     
-    return progress_list
+    return json_response(List[ProgressResponse], owned.all(), response)
 
@@ -1,15 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from sqlalchemy import and_, case, func
 from sqlalchemy.orm import Session
-from typing import List
-from ..database import get_db
-from ..models import Project, User, Progress
-from ..schemas import ProjectCreate, ProjectUpdate, ProjectResponse
-from ..deps import get_current_user
+from typing import List, Optional
+from ..database import get_db, db_handler
+from ..models import Project, User, Progress, Task, TaskStatus
+from ..schemas import ProjectCreate, ProjectUpdate, ProjectResponse, ProjectSummaryResponse
+from ..deps import get_current_user, get_owned_project
+from ..etags import weak_etag, etag_matches, not_modified, set_etag
+from ..serialization import json_response
 
 router = APIRouter()
 
 
 @router.post("/", response_model=ProjectResponse, status_code=status.HTTP_201_CREATED)
+@db_handler
 def create_project(
     project_data: ProjectCreate,
     db: Session = Depends(get_db),
@@ -34,55 +39,108 @@ def create_project(
 
 
 @router.get("/", response_model=List[ProjectResponse])
+@db_handler
 def get_projects(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get all projects for current user"""
-    projects = db.query(Project).filter(Project.owner_id == current_user.id).all()
-    return projects
+    """Get all projects for current user (ETag / If-None-Match aware)"""
+    owned = db.query(Project).filter(Project.owner_id == current_user.id)
+    state = owned.with_entities(
+        func.count(Project.id), func.max(Project.id), func.max(Project.updated_at)
+    ).one()
+    etag = weak_etag("projects", current_user.id, *state)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    return json_response(List[ProjectResponse], owned.all(), response)
 
 
-@router.get("/{project_id}", response_model=ProjectResponse)
-def get_project(
-    project_id: int,
+def _summary_columns(now: datetime) -> dict:
+    """Selectable summary fields, as columns of Project outer join Task grouped by project."""
+    def count_where(condition):
+        return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+    task_count = func.count(Task.id)
+    done_count = count_where(Task.status == TaskStatus.DONE)
+    open_task = Task.status != TaskStatus.DONE
+    return {
+        "name": Project.name,
+        "description": Project.description,
+        "created_at": Project.created_at,
+        "updated_at": Project.updated_at,
+        "completion_percentage": case((task_count > 0, done_count * 100.0 / task_count), else_=0.0),
+        "task_count": task_count,
+        "todo_count": count_where(Task.status == TaskStatus.TODO),
+        "in_progress_count": count_where(Task.status == TaskStatus.IN_PROGRESS),
+        "done_count": done_count,
+        **{
+            f"{priority.value}_priority_count": count_where(Task.priority == priority.value)
+            for priority in Task.Priority
+        },
+        "overdue_count": count_where(and_(open_task, Task.due_date < now)),
+        "next_due_date": func.min(case((and_(open_task, Task.due_date >= now), Task.due_date))),
+    }
+
+
+@router.get(
+    "/summary",
+    response_model=List[ProjectSummaryResponse],
+    response_model_exclude_unset=True,
+)
+@db_handler
+def get_projects_summary(
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (default: all)"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get a specific project"""
-    project = db.query(Project).filter(
-        Project.id == project_id,
+    """Projects of the current user with progress and task counts, from one grouped query"""
+    columns = _summary_columns(datetime.now(timezone.utc))
+    if fields:
+        selected = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = sorted(set(selected) - set(columns) - {"id"})
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(unknown)}",
+            )
+        columns = {field: column for field, column in columns.items() if field in selected}
+
+    query = db.query(Project.id, *(column.label(field) for field, column in columns.items())).filter(
         Project.owner_id == current_user.id
-    ).first()
-    
-    if not project:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Project not found"
-        )
-    
+    )
+    if any(field not in Project.__table__.columns for field in columns):
+        # Only aggregates need the tasks; project columns alone skip the join
+        query = query.outerjoin(Task, Task.project_id == Project.id)
+    rows = query.group_by(Project.id).order_by(Project.id).all()
+    return [ProjectSummaryResponse(**row._mapping) for row in rows]
+
+
+@router.get("/{project_id}", response_model=ProjectResponse)
+async def get_project(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    project: Project = Depends(get_owned_project)
+):
+    """Get a specific project (ETag / If-None-Match aware)"""
+    # The row is loaded by the ownership check anyway, so tag its fields
+    etag = weak_etag("project", project.id, project.name, project.description, project.updated_at)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
     return project
 
 
 @router.put("/{project_id}", response_model=ProjectResponse)
+@db_handler
 def update_project(
-    project_id: int,
     project_data: ProjectUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    project: Project = Depends(get_owned_project),
+    db: Session = Depends(get_db)
 ):
     """Update a project"""
-    project = db.query(Project).filter(
-        Project.id == project_id,
-        Project.owner_id == current_user.id
-    ).first()
-    
-    if not project:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Project not found"
-        )
-    
     update_data = project_data.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(project, field, value)
@@ -94,23 +152,12 @@ def update_project(
 
 
 @router.delete("/{project_id}", status_code=status.HTTP_204_NO_CONTENT)
+@db_handler
 def delete_project(
-    project_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    project: Project = Depends(get_owned_project),
+    db: Session = Depends(get_db)
 ):
     """Delete a project"""
-    project = db.query(Project).filter(
-        Project.id == project_id,
-        Project.owner_id == current_user.id
-    ).first()
-    
-    if not project:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Project not found"
-        )
-    
     db.delete(project)
     db.commit()
     
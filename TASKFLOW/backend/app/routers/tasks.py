@@ -1,28 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from sqlalchemy import delete, func, insert, tuple_, update
 from sqlalchemy.orm import Session
-from typing import List
-from ..database import get_db
-from ..models import Task, Project, User
-from ..schemas import TaskCreate, TaskUpdate, TaskResponse
-from ..deps import get_current_user
+from sqlalchemy.orm.exc import StaleDataError
+from typing import List, Optional
+from ..database import get_db, db_handler
+from ..models import Task, TaskTombstone, Project, User, TaskStatus
+from ..schemas import (
+    TaskCreate, TaskUpdate, TaskResponse,
+    TaskBulkRequest, TaskBulkResponse, TaskBulkResult, TaskChangesResponse,
+)
+from ..deps import get_current_user, get_owned_task, load_owned_project
+from ..task_changes import (
+    bump_projects, bump_task_project, record_tombstones, encode_change_cursor, decode_change_cursor,
+)
+from ..etags import weak_etag, etag_matches, not_modified, set_etag
+from ..progress_counters import apply_status_delta, apply_counter_deltas
+from ..events import publish_after_commit, task_event, task_deleted_event, progress_event
+from ..serialization import json_response
+
+# Fields each bulk operation may change
+BULK_UPDATE_FIELDS = {"title", "description", "status", "due_date", "scheduled_day", "priority"}
+BULK_MOVE_FIELDS = {"status", "project_id"}
+# Columns that cannot be set to null
+NON_NULLABLE_FIELDS = {"title", "status", "project_id"}
+# Attempts for an update without a client version that loses a race
+UPDATE_ATTEMPTS = 3
 
 router = APIRouter()
 
 
 @router.post("/", response_model=TaskResponse, status_code=status.HTTP_201_CREATED)
+@db_handler
 def create_task(
     task_data: TaskCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Create a new task"""
-    # Verify project ownership
-    project = db.query(Project).filter(
-        Project.id == task_data.project_id,
-        Project.owner_id == current_user.id
-    ).first()
+    # Verify project ownership and take its next change sequence
+    change_seq = bump_projects(db, [task_data.project_id], current_user.id).get(task_data.project_id)
     
-    if not project:
+    if change_seq is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Project not found"
@@ -35,166 +55,404 @@ def create_task(
         due_date=task_data.due_date,
         scheduled_day=task_data.scheduled_day,
         priority=task_data.priority or 'medium',
-        project_id=task_data.project_id
+        project_id=task_data.project_id,
+        change_seq=change_seq
     )
     db.add(new_task)
+    # Update project progress in the same transaction
+    progress = apply_status_delta(db, task_data.project_id, None, new_task.status)
     db.commit()
     db.refresh(new_task)
     
-    # Update project progress
-    _update_project_progress(db, task_data.project_id)
-    
+    publish_after_commit(new_task.project_id, change_seq, [task_event("created", new_task), *progress_event(progress)])
     return new_task
 
 
+@router.post("/bulk", response_model=TaskBulkResponse)
+@db_handler
+def bulk_tasks(
+    bulk: TaskBulkRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Create, update, move and delete many tasks in one transaction.
+
+    Ownership is checked once per distinct task and project, creates are
+    written with multi-row INSERT ... RETURNING statements, updates and
+    moves are one version-checked UPDATE per task, and progress is updated
+    once per touched project. Operations that fail validation are
+    reported in their result item and do not abort the rest of the batch.
+    """
+    operations = bulk.operations
+    task_ids = {op.id for op in operations if op.op != "create" and op.id is not None}
+    project_ids = {
+        op.project_id for op in operations
+        if op.op in ("create", "move") and op.project_id is not None
+    }
+
+    # Referenced tasks, already filtered by the ownership predicate
+    tasks_by_id = {}
+    if task_ids:
+        owned_tasks = db.query(Task).join(Task.project).filter(
+            Task.id.in_(task_ids),
+            Project.owner_id == current_user.id
+        ).all()
+        tasks_by_id = {task.id: task for task in owned_tasks}
+
+    # Target projects of creates and moves (filtered by ownership) and the
+    # projects of the referenced tasks all get their next change sequence
+    change_seqs = bump_projects(
+        db, project_ids | {task.project_id for task in tasks_by_id.values()}, current_user.id
+    )
+    owned_projects = set(change_seqs)
+
+    results: List[TaskBulkResult] = [None] * len(operations)
+    deltas = defaultdict(lambda: defaultdict(int))
+    creates = []
+    updated = []
+    tombstones = []
+    events = defaultdict(list)
+    now = datetime.now(timezone.utc)
+
+    def fail(index, op, status_code, detail):
+        results[index] = TaskBulkResult(
+            index=index, op=op.op, ok=False, status_code=status_code, id=op.id, detail=detail
+        )
+
+    for index, op in enumerate(operations):
+        if op.op == "create":
+            if op.project_id not in owned_projects:
+                fail(index, op, status.HTTP_404_NOT_FOUND, "Project not found")
+                continue
+            if not op.title:
+                fail(index, op, status.HTTP_422_UNPROCESSABLE_ENTITY, "title is required")
+                continue
+            values = {
+                "title": op.title,
+                "description": op.description,
+                "status": op.status or TaskStatus.TODO,
+                "due_date": op.due_date,
+                "scheduled_day": op.scheduled_day,
+                "priority": op.priority or 'medium',
+                "project_id": op.project_id,
+                "change_seq": change_seqs[op.project_id],
+            }
+            creates.append((index, values))
+            deltas[op.project_id][values["status"]] += 1
+            continue
+
+        task = tasks_by_id.get(op.id)
+        if task is None:
+            fail(index, op, status.HTTP_404_NOT_FOUND, "Task not found")
+            continue
+
+        if op.op == "delete":
+            deltas[task.project_id][task.status] -= 1
+            tombstones.append((task.id, task.project_id, change_seqs[task.project_id]))
+            events[task.project_id].append(task_deleted_event(task.id))
+            db.delete(task)
+            del tasks_by_id[op.id]
+            results[index] = TaskBulkResult(
+                index=index, op=op.op, ok=True, status_code=status.HTTP_204_NO_CONTENT, id=op.id
+            )
+            continue
+
+        allowed = BULK_MOVE_FIELDS if op.op == "move" else BULK_UPDATE_FIELDS
+        fields = {
+            field: value
+            for field, value in op.model_dump(include=allowed, exclude_unset=True).items()
+            if value is not None or field not in NON_NULLABLE_FIELDS
+        }
+        if "project_id" in fields and fields["project_id"] not in owned_projects:
+            fail(index, op, status.HTTP_404_NOT_FOUND, "Project not found")
+            continue
+
+        deltas[task.project_id][task.status] -= 1
+        previous_project_id = task.project_id
+        for field, value in fields.items():
+            setattr(task, field, value)
+        if task.project_id != previous_project_id:
+            tombstones.append((task.id, previous_project_id, change_seqs[previous_project_id]))
+            events[previous_project_id].append(task_deleted_event(task.id))
+        task.updated_at = now
+        task.change_seq = change_seqs[task.project_id]
+        deltas[task.project_id][task.status] += 1
+        updated.append((index, op, task))
+
+    # Version-checked UPDATEs and DELETEs of the loaded tasks
+    try:
+        db.flush()
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Tasks were modified by another request"
+        )
+    for index, op, task in updated:
+        results[index] = TaskBulkResult(
+            index=index, op=op.op, ok=True, status_code=status.HTTP_200_OK, id=task.id,
+            task=TaskResponse.model_validate(task)
+        )
+        events[task.project_id].append(task_event("updated", results[index].task))
+    record_tombstones(db, tombstones)
+
+    if creates:
+        # Without sort_by_parameter_order the rows go out as multi-row INSERTs
+        # on every backend, but in no guaranteed RETURNING order, so they are
+        # matched back by project and title. Creates sharing both are inserted
+        # in parameter order instead (one INSERT per row on SQLite).
+        keys = Counter((values["project_id"], values["title"]) for _, values in creates)
+        unique = [(index, values) for index, values in creates if keys[values["project_id"], values["title"]] == 1]
+        shared = [(index, values) for index, values in creates if keys[values["project_id"], values["title"]] > 1]
+        created = {}
+        if unique:
+            by_key = {
+                (task.project_id, task.title): task
+                for task in db.scalars(insert(Task).returning(Task), [values for _, values in unique])
+            }
+            for index, values in unique:
+                created[index] = by_key[values["project_id"], values["title"]]
+        if shared:
+            tasks = db.scalars(
+                insert(Task).returning(Task, sort_by_parameter_order=True),
+                [values for _, values in shared]
+            ).all()
+            created.update(zip((index for index, _ in shared), tasks))
+        for index, _ in creates:
+            task = created[index]
+            results[index] = TaskBulkResult(
+                index=index, op="create", ok=True, status_code=status.HTTP_201_CREATED, id=task.id,
+                task=TaskResponse.model_validate(task)
+            )
+            events[task.project_id].append(task_event("created", results[index].task))
+
+    # Update project progress once per touched project, in the same transaction
+    for project_id, project_deltas in deltas.items():
+        progress = apply_counter_deltas(db, project_id, project_deltas)
+        events[project_id].extend(progress_event(progress))
+
+    db.commit()
+
+    for project_id, project_events in events.items():
+        publish_after_commit(project_id, change_seqs[project_id], project_events)
+
+    return {"results": results}
+
+
 @router.get("/project/{project_id}", response_model=List[TaskResponse])
+@db_handler
 def get_tasks_by_project(
     project_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get all tasks for a project"""
-    # Verify project ownership
-    project = db.query(Project).filter(
+    """
+    Get all tasks for a project.
+
+    The ETag comes from one aggregate over the project's tasks, which also
+    checks ownership, so a matching If-None-Match is answered with 304
+    without loading the tasks.
+    """
+    state = db.query(
+        func.count(Task.id), func.max(Task.id), func.sum(Task.version), func.max(Task.updated_at)
+    ).select_from(Project).outerjoin(Task, Task.project_id == Project.id).filter(
         Project.id == project_id,
         Project.owner_id == current_user.id
-    ).first()
-    
-    if not project:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Project not found"
-        )
-    
+    ).group_by(Project.id).first()
+    if state is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
+    etag = weak_etag("tasks", project_id, *state)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
     tasks = db.query(Task).filter(Task.project_id == project_id).all()
-    return tasks
+    return json_response(List[TaskResponse], tasks, response)
 
 
-@router.get("/{task_id}", response_model=TaskResponse)
-def get_task(
-    task_id: int,
+@router.get("/changes", response_model=TaskChangesResponse)
+@db_handler
+def get_task_changes(
+    project_id: int,
+    since: Optional[str] = None,
+    limit: int = 500,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get a specific task"""
-    task = db.query(Task).filter(Task.id == task_id).first()
-    
-    if not task:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Task not found"
-        )
-    
-    # Verify project ownership
-    project = db.query(Project).filter(
-        Project.id == task.project_id,
-        Project.owner_id == current_user.id
-    ).first()
-    
-    if not project:
+    """
+    Tasks of a project written or removed after the ``since`` cursor.
+
+    Without ``since`` every task is returned (and no tombstones), which is
+    how a client starts syncing. Entries are ordered by (change_seq, id):
+    pass the returned ``cursor`` back while ``has_more`` is true, then keep it
+    for the next sync. Both reads are range scans on (project_id, change_seq).
+    """
+    if not load_owned_project(db, project_id, current_user.id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Task not found"
+            detail="Project not found"
         )
-    
+    limit = max(1, min(1000, limit))
+    change_seq, last_id = decode_change_cursor(since, project_id) if since else (-1, 0)
+
+    tasks = db.query(Task).filter(
+        Task.project_id == project_id,
+        tuple_(Task.change_seq, Task.id) > tuple_(change_seq, last_id)
+    ).order_by(Task.change_seq, Task.id).limit(limit + 1).all()
+    tombstones = []
+    if since:
+        tombstones = db.query(TaskTombstone).filter(
+            TaskTombstone.project_id == project_id,
+            tuple_(TaskTombstone.change_seq, TaskTombstone.task_id) > tuple_(change_seq, last_id)
+        ).order_by(TaskTombstone.change_seq, TaskTombstone.task_id).limit(limit + 1).all()
+
+    # Merge both streams; a removal sorts before a write of the same task
+    entries = sorted(
+        [(task.change_seq, task.id, 1, task) for task in tasks]
+        + [(tombstone.change_seq, tombstone.task_id, 0, tombstone) for tombstone in tombstones],
+        key=lambda entry: entry[:3]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    if entries:
+        change_seq, last_id = entries[-1][:2]
+
+    return json_response(TaskChangesResponse, {
+        "changes": [entry[3] for entry in entries if entry[2]],
+        "deleted": [entry[3] for entry in entries if not entry[2]],
+        "cursor": encode_change_cursor(project_id, change_seq, last_id),
+        "has_more": has_more,
+    })
+
+
+@router.get("/{task_id}", response_model=TaskResponse)
+async def get_task(task: Task = Depends(get_owned_task)):
+    """Get a specific task"""
     return task
 
 
+def _update_owned_task(db: Session, task_id: int, project_id: int, change_seq: int, values: dict, expected_version: int = None):
+    """
+    Apply ``values`` to the task if it is still in ``project_id``, whose
+    change sequence the caller advanced (checking ownership and locking the
+    project). Returns the updated row plus its ``previous_status``, or None
+    when no row matched (task moved or deleted, stale version).
+
+    On Postgres this is one UPDATE ... FROM ... RETURNING: the previous status
+    comes from a self-join whose version must equal the updated row's, so a
+    row changed by a concurrent writer fails to match instead of reporting a
+    stale status. SQLite's RETURNING cannot read other FROM items, so there
+    the row is read first and the UPDATE is guarded by its version.
+    """
+    tasks = Task.__table__
+    statement = update(tasks).values(
+        **values, version=tasks.c.version + 1, change_seq=change_seq
+    ).where(tasks.c.id == task_id, tasks.c.project_id == project_id)
+    if expected_version is not None:
+        statement = statement.where(tasks.c.version == expected_version)
+
+    if db.get_bind().dialect.name == "postgresql":
+        previous = tasks.alias("previous")
+        statement = statement.where(
+            previous.c.id == tasks.c.id,
+            previous.c.version == tasks.c.version,
+        ).returning(*tasks.c, previous.c.status.label("previous_status"))
+        return db.execute(statement).mappings().first()
+
+    current = db.query(Task.status, Task.version).filter(
+        Task.id == task_id,
+        Task.project_id == project_id
+    ).first()
+    if current is None:
+        return None
+    row = db.execute(
+        statement.where(tasks.c.version == current.version).returning(*tasks.c)
+    ).mappings().first()
+    return {**row, "previous_status": current.status} if row is not None else None
+
+
 @router.put("/{task_id}", response_model=TaskResponse)
+@db_handler
 def update_task(
     task_id: int,
     task_data: TaskUpdate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Update a task"""
-    task = db.query(Task).filter(Task.id == task_id).first()
-    
-    if not task:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Task not found"
-        )
-    
-    # Verify project ownership
-    project = db.query(Project).filter(
-        Project.id == task.project_id,
-        Project.owner_id == current_user.id
-    ).first()
-    
-    if not project:
+    """
+    Update a task.
+
+    The ownership check advances the project's change sequence
+    (app.task_changes); write and response then come from a single
+    UPDATE ... RETURNING. When ``version`` is given and no longer current the
+    update is rejected with 409; without it the update applies to the current
+    version.
+    """
+    values = {
+        field: value
+        for field, value in task_data.model_dump(exclude_unset=True, exclude={"version"}).items()
+        if value is not None or field not in NON_NULLABLE_FIELDS
+    }
+
+    for _ in range(UPDATE_ATTEMPTS):
+        stamp = bump_task_project(db, task_id, current_user.id)
+        if stamp is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Task not found"
+            )
+        row = _update_owned_task(db, task_id, *stamp, values, task_data.version)
+        # Nothing matched: stale version, or the task moved in the meantime
+        if row is not None or task_data.version is not None:
+            break
+    if row is None:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Task not found"
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Task was modified by another request"
         )
-    
-    update_data = task_data.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(task, field, value)
-    
+
+    # Update project progress in the same transaction
+    progress = apply_status_delta(db, row["project_id"], row["previous_status"], row["status"])
     db.commit()
-    db.refresh(task)
-    
-    # Update project progress
-    _update_project_progress(db, task.project_id)
     
+    task = TaskResponse.model_validate(dict(row))
+    publish_after_commit(row["project_id"], row["change_seq"], [task_event("updated", task), *progress_event(progress)])
     return task
 
 
 @router.delete("/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
+@db_handler
 def delete_task(
     task_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Delete a task"""
-    task = db.query(Task).filter(Task.id == task_id).first()
+    """Delete a task, leaving a tombstone for delta sync"""
+    # Checks ownership and takes the project's next change sequence
+    stamp = bump_task_project(db, task_id, current_user.id)
+    row = None
+    if stamp is not None:
+        project_id, change_seq = stamp
+        row = db.execute(
+            delete(Task)
+            .where(Task.id == task_id, Task.project_id == project_id)
+            .returning(Task.status)
+            .execution_options(synchronize_session=False)
+        ).first()
     
-    if not task:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Task not found"
         )
     
-    # Verify project ownership
-    project = db.query(Project).filter(
-        Project.id == task.project_id,
-        Project.owner_id == current_user.id
-    ).first()
-    
-    if not project:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Task not found"
-        )
-    
-    project_id = task.project_id
-    db.delete(task)
+    # Record the deletion and update project progress in the same transaction
+    record_tombstones(db, [(task_id, project_id, change_seq)])
+    progress = apply_status_delta(db, project_id, row.status, None)
     db.commit()
     
-    # Update project progress
-    _update_project_progress(db, project_id)
+    publish_after_commit(project_id, change_seq, [task_deleted_event(task_id), *progress_event(progress)])
     
     return None
-
-
-def _update_project_progress(db: Session, project_id: int):
-    """Helper function to update project completion percentage"""
-    from ..models import Progress
-    
-    tasks = db.query(Task).filter(Task.project_id == project_id).all()
-    if not tasks:
-        completion_percentage = 0.0
-    else:
-        done_tasks = sum(1 for task in tasks if task.status.value == "done")
-        completion_percentage = (done_tasks / len(tasks)) * 100
-    
-    progress = db.query(Progress).filter(Progress.project_id == project_id).first()
-    if progress:
-        progress.completion_percentage = completion_percentage
-    else:
-        progress = Progress(project_id=project_id, completion_percentage=completion_percentage)
-        db.add(progress)
-    
-    db.commit()
-
@@ -1,22 +1,41 @@
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from ..database import get_db
+from ..database import get_db, db_handler, run_with_session
 from ..models import User
 from ..schemas import UserCreate, UserResponse, Token, UserUpdate, UsersListResponse
-from ..auth import get_password_hash, create_access_token, authenticate_user
+from ..auth import hash_password, create_access_token, authenticate_user, user_token_claims, get_user_by_email
 from ..config import settings
 from ..deps import get_current_user
+from ..pagination import paginate
+from ..counts import CountMode
+from ..principals import principal_cache, revoke_tokens
+from ..csv_export import stream_csv
+from ..serialization import json_response
 
 router = APIRouter()
 
 
+def _create_user(db: Session, user_data: UserCreate, hashed_password: str) -> User:
+    new_user = User(
+        email=user_data.email,
+        hashed_password=hashed_password,
+        full_name=user_data.full_name
+    )
+    db.add(new_user)
+    db.commit()
+    db.refresh(new_user)
+    return new_user
+
+
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     """Register a new user"""
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = await run_with_session(db, get_user_by_email, user_data.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -24,24 +43,17 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
-    new_user = User(
-        email=user_data.email,
-        hashed_password=hashed_password,
-        full_name=user_data.full_name
-    )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    
-    return new_user
+    hashed_password = await hash_password(user_data.password)
+    return await run_with_session(db, _create_user, user_data, hashed_password)
 
 
 @router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     """Login and get access token"""
     try:
-        user = authenticate_user(db, form_data.username, form_data.password)
+        user = await authenticate_user(db, form_data.username, form_data.password)
+    except HTTPException:
+        raise
     except Exception as e:
         # Defensive: if something goes wrong during password verification
         # (e.g. malformed hash), log and return a 401 instead of 500.
@@ -57,48 +69,62 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data=user_token_claims(user), expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 @router.get("/me", response_model=UserResponse)
-def get_current_user_info(current_user: User = Depends(get_current_user)):
+async def get_current_user_info(current_user: User = Depends(get_current_user)):
     """Get current user information"""
     return current_user
 
 
-@router.put("/me", response_model=UserResponse)
-def update_me(
-    data: UserUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    """Update current user profile"""
-    if data.email and data.email != current_user.email:
+def _update_me(db: Session, user_id: int, data: UserUpdate, hashed_password: str | None) -> User:
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
+    if data.email and data.email != user.email:
         # Check if email is taken
         existing = db.query(User).filter(User.email == data.email).first()
         if existing:
             raise HTTPException(status_code=400, detail="Email already registered")
-        current_user.email = data.email
+        user.email = data.email
     
     if data.full_name is not None:
-        current_user.full_name = data.full_name
+        user.full_name = data.full_name
         
-    if data.password:
-        current_user.hashed_password = get_password_hash(data.password)
+    if hashed_password:
+        user.hashed_password = hashed_password
         
-    db.add(current_user)
+    db.add(user)
     db.commit()
-    db.refresh(current_user)
-    return current_user
+    db.refresh(user)
+    principal_cache.invalidate(user.id)
+    return user
+
+
+@router.put("/me", response_model=UserResponse)
+async def update_me(
+    data: UserUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Update current user profile"""
+    hashed_password = await hash_password(data.password) if data.password else None
+    return await run_with_session(db, _update_me, current_user.id, data, hashed_password)
 
 
 @router.get("/", response_model=UsersListResponse)
+@db_handler
 def list_users(
     q: str | None = None,
     page: int = 1,
     per_page: int = 20,
+    cursor: str | None = None,
+    include_total: bool | None = None,
+    count_mode: CountMode = CountMode.EXACT,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
@@ -111,34 +137,22 @@ def list_users(
         like = f"%{q}%"
         query = query.filter((User.email.ilike(like)) | (User.full_name.ilike(like)))
 
-    total = query.count()
     page = max(1, page)
     per_page = max(1, min(200, per_page))
-    users = query.order_by(User.id.desc()).offset((page - 1) * per_page).limit(per_page).all()
-
-    return {"items": users, "total": total, "page": page, "per_page": per_page}
+    return json_response(UsersListResponse, paginate(query, User, page, per_page, cursor, include_total, count_mode))
 
 
 
-@router.get("/export", response_class=Response)
-def export_users_csv(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """Export users as CSV (admin only)"""
+@router.get("/export", response_class=StreamingResponse)
+async def export_users_csv(gzip: bool = False, current_user: User = Depends(get_current_user)):
+    """Export users as CSV, streamed (admin only)"""
     if not getattr(current_user, 'is_admin', False):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
-    users = db.query(User).order_by(User.id).all()
-    # Build CSV
-    lines = ["id,email,full_name,is_admin,created_at"]
-    for u in users:
-        lines.append(f'{u.id},{u.email},{u.full_name or ""},{int(bool(u.is_admin))},{u.created_at.isoformat()}')
-    csv = "\n".join(lines)
-    return Response(content=csv, media_type='text/csv')
+    statement = select(User.id, User.email, User.full_name, User.is_admin, User.created_at).order_by(User.id)
+    return stream_csv(statement, ["id", "email", "full_name", "is_admin", "created_at"], "users.csv", gzip)
 
 
-@router.put("/{user_id}", response_model=UserResponse)
-def update_user(user_id: int, data: UserUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """Update a user's profile (admin only)"""
-    if not getattr(current_user, 'is_admin', False):
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+def _update_user(db: Session, user_id: int, data: UserUpdate, hashed_password: str | None) -> User:
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
@@ -146,22 +160,35 @@ def update_user(user_id: int, data: UserUpdate, db: Session = Depends(get_db), c
         user.email = data.email
     if data.full_name is not None:
         user.full_name = data.full_name
-    if data.password:
-        user.hashed_password = get_password_hash(data.password)
+    if hashed_password:
+        user.hashed_password = hashed_password
     if data.is_admin is not None:
         user.is_admin = bool(data.is_admin)
         user.role = "admin" if user.is_admin else "user"
     if data.role is not None:
         user.role = data.role
         user.is_admin = (data.role == "admin")
+    if data.password or data.is_admin is not None or data.role is not None:
+        revoke_tokens(user)
         
     db.add(user)
     db.commit()
     db.refresh(user)
+    principal_cache.invalidate(user.id)
     return user
 
 
+@router.put("/{user_id}", response_model=UserResponse)
+async def update_user(user_id: int, data: UserUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Update a user's profile (admin only)"""
+    if not getattr(current_user, 'is_admin', False):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    hashed_password = await hash_password(data.password) if data.password else None
+    return await run_with_session(db, _update_user, user_id, data, hashed_password)
+
+
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
+@db_handler
 def delete_user(user_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """Delete a user (admin only)"""
     if not getattr(current_user, 'is_admin', False):
@@ -171,5 +198,6 @@ def delete_user(user_id: int, db: Session = Depends(get_db), current_user: User
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     db.delete(user)
     db.commit()
+    principal_cache.invalidate(user_id)
     return
 
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime
-from typing import Optional
+from typing import Any, Literal, Optional
 from .models import TaskStatus
 
 
@@ -33,11 +33,18 @@ class UserResponse(UserBase):
         from_attributes = True
 
 
-class UsersListResponse(BaseModel):
-    items: list[UserResponse]
-    total: int
-    page: int
+# Pagination: page is None in cursor mode, total is None unless requested
+class PageMeta(BaseModel):
+    total: Optional[int] = None
+    total_is_exact: Optional[bool] = None
+    page: Optional[int] = None
     per_page: int
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+
+class UsersListResponse(PageMeta):
+    items: list[UserResponse]
 
 
 # Token schemas
@@ -48,6 +55,8 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+    user_id: Optional[int] = None
+    token_version: Optional[int] = None
 
 
 # Project schemas
@@ -75,6 +84,27 @@ class ProjectResponse(ProjectBase):
         from_attributes = True
 
 
+class ProjectSummaryResponse(BaseModel):
+    """A project with its task aggregates; fields not selected are omitted."""
+    id: int
+    name: Optional[str] = None
+    description: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    completion_percentage: Optional[float] = None
+    task_count: Optional[int] = None
+    todo_count: Optional[int] = None
+    in_progress_count: Optional[int] = None
+    done_count: Optional[int] = None
+    low_priority_count: Optional[int] = None
+    medium_priority_count: Optional[int] = None
+    high_priority_count: Optional[int] = None
+    # Not done and due before now
+    overdue_count: Optional[int] = None
+    # Earliest due date of a task not done and not overdue
+    next_due_date: Optional[datetime] = None
+
+
 # Task schemas
 class TaskBase(BaseModel):
     title: str
@@ -96,11 +126,14 @@ class TaskUpdate(BaseModel):
     due_date: Optional[datetime] = None
     scheduled_day: Optional[datetime] = None
     priority: Optional[str] = None
+    # Version the client last read; the update is rejected with 409 if stale
+    version: Optional[int] = None
 
 
 class TaskResponse(TaskBase):
     id: int
     project_id: int
+    version: int = 1
     created_at: datetime
     updated_at: Optional[datetime] = None
     
@@ -108,9 +141,69 @@ class TaskResponse(TaskBase):
         from_attributes = True
 
 
+class TaskBulkOperation(BaseModel):
+    """
+    One operation of a bulk request.
+
+    - create: requires project_id and title
+    - update: requires id, applies the given fields
+    - move: requires id, changes status and/or project_id
+    - delete: requires id
+    """
+    op: Literal["create", "update", "move", "delete"]
+    id: Optional[int] = None
+    project_id: Optional[int] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    status: Optional[TaskStatus] = None
+    due_date: Optional[datetime] = None
+    scheduled_day: Optional[datetime] = None
+    priority: Optional[str] = None
+
+
+class TaskBulkRequest(BaseModel):
+    operations: list[TaskBulkOperation] = Field(min_length=1, max_length=1000)
+
+
+class TaskBulkResult(BaseModel):
+    index: int
+    op: str
+    ok: bool
+    status_code: int
+    id: Optional[int] = None
+    detail: Optional[str] = None
+    task: Optional[TaskResponse] = None
+
+
+class TaskBulkResponse(BaseModel):
+    results: list[TaskBulkResult]
+
+
+class TaskTombstoneResponse(BaseModel):
+    task_id: int
+    project_id: int
+    deleted_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class TaskChangesResponse(BaseModel):
+    """Tasks written and removed after the request's cursor."""
+    changes: list[TaskResponse]
+    deleted: list[TaskTombstoneResponse]
+    # Pass back as ``since``: for the next page while has_more, else next sync
+    cursor: str
+    has_more: bool
+
+
 # Progress schemas
 class ProgressBase(BaseModel):
     completion_percentage: float = 0.0
+    total_tasks: int = 0
+    todo_tasks: int = 0
+    in_progress_tasks: int = 0
+    done_tasks: int = 0
 
 
 class ProgressResponse(ProgressBase):
@@ -129,21 +222,57 @@ class AdminLogResponse(BaseModel):
     action: str
     target_type: str
     target_id: int
-    details: Optional[str] = None
+    details: Optional[dict[str, Any]] = None
     created_at: datetime
     
     class Config:
         from_attributes = True
 
 
+class AdminLogsListResponse(PageMeta):
+    items: list[AdminLogResponse]
+
+
+class TasksListResponse(PageMeta):
+    items: list[TaskResponse]
+
+
+class ProjectOwner(BaseModel):
+    id: int
+    email: EmailStr
+    full_name: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class AdminProjectResponse(ProjectResponse):
+    owner: ProjectOwner
+    task_count: int = 0
+    todo_count: int = 0
+    in_progress_count: int = 0
+    done_count: int = 0
+    completion_percentage: float = 0.0
+
+
+class AdminProjectsListResponse(PageMeta):
+    items: list[AdminProjectResponse]
+
+
 class AdminStatsResponse(BaseModel):
     total_users: int
     total_projects: int
     total_tasks: int
+    totals_are_exact: bool = True
     recent_users: list[UserResponse]
     recent_projects: list[ProjectResponse]
     tasks_completed_today: int = 0
     tasks_due_today: int = 0
+    # Snapshot metadata
+    computed_at: datetime
+    age_seconds: float = 0.0
+    refresh_interval_seconds: int
+    stale: bool = False
 
 
 class UserSuspendRequest(BaseModel):
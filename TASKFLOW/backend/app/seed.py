@@ -0,0 +1,341 @@
+"""
+Synthetic dataset loader for capacity tests and benchmarks.
+
+    python -m app.seed --users 10000 --projects 100000 --tasks 5000000 --admin-logs 1000000
+
+Generates users, projects, tasks, their progress rows and admin logs from a
+seeded ``random.Random``, as plain tuples, and bulk-loads them without the
+ORM: Postgres through ``COPY ... FROM STDIN`` fed CSV from an in-memory
+buffer, SQLite (and other databases) through DBAPI ``executemany`` in large
+batches. Everything is written in one transaction with explicit ids that
+continue after the existing rows; Postgres sequences are moved past them at
+the end.
+
+Every user shares one bcrypt hash of ``--password``, so hashing costs one
+call whatever the scale. Emails are ``<prefix>-<n>@example.com`` plus an
+admin ``<prefix>-admin@example.com``; the prefix defaults to ``seed<seed>``.
+
+Distributions: tasks are spread over projects at random cut points (many
+small projects, a few large ones); about 45% are done, 20% in progress and
+35% to do; priorities are 55% medium, 25% low, 20% high; three quarters have
+a due date, in the past for done tasks and around the reference date
+(partly overdue) for open ones.
+"""
+import argparse
+import contextlib
+import csv
+import io
+import random
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+from sqlalchemy import func, select, text
+from sqlalchemy.engine import Connection, Engine
+from .models import AdminLog, Progress, Project, Task, TaskStatus, User
+from .progress_counters import completion_percentage
+
+DEFAULT_PASSWORD = "taskflow-seed"
+# Rows per COPY chunk / executemany call
+BATCH_SIZE = 50_000
+
+TASK_STATUSES = ((TaskStatus.DONE, 0.45), (TaskStatus.IN_PROGRESS, 0.65), (TaskStatus.TODO, 1.0))
+TASK_PRIORITIES = (("medium", 0.55), ("low", 0.80), ("high", 1.0))
+ADMIN_ACTIONS = (
+    ("suspend_user", "user"), ("promote_user", "user"), ("reset_password", "user"),
+    ("delete_project", "project"), ("delete_task", "task"), ("delete_user", "user"),
+)
+DAY = 86400
+YEAR = 365 * DAY
+
+
+@dataclass
+class Scale:
+    users: int
+    projects: int
+    tasks: int
+    admin_logs: int
+
+
+def _pick(table, roll: float):
+    """Value of a cumulative ((value, upper bound), ...) table for a roll in [0, 1)."""
+    for value, bound in table:
+        if roll < bound:
+            return value
+    return table[-1][0]
+
+
+def task_counts(rng: random.Random, tasks: int, projects: int) -> list[int]:
+    """Split ``tasks`` over ``projects`` at random cut points."""
+    cuts = sorted(rng.randrange(tasks + 1) for _ in range(projects - 1))
+    return [b - a for a, b in zip([0] + cuts, cuts + [tasks])]
+
+
+# ==================== LOADING ====================
+
+class Timestamps:
+    """
+    Whole-second UNIX times as timestamp literals: the text SQLAlchemy's SQLite
+    DateTime stores, or ISO with a UTC offset for COPY. Each date is formatted
+    once, so a row pays a few integer divisions instead of datetime arithmetic.
+    """
+
+    def __init__(self, dialect: str):
+        self.suffix = ".000000" if dialect == "sqlite" else "+00:00"
+        self.dates = {}
+
+    def __call__(self, seconds: int) -> str:
+        day, rest = divmod(seconds, DAY)
+        date = self.dates.get(day)
+        if date is None:
+            date = self.dates[day] = datetime.fromtimestamp(day * DAY, timezone.utc).strftime("%Y-%m-%d ")
+        hours, rest = divmod(rest, 3600)
+        minutes, secs = divmod(rest, 60)
+        return f"{date}{hours:02d}:{minutes:02d}:{secs:02d}{self.suffix}"
+
+
+class BulkWriter:
+    """Writes tuples into a table by the fastest path the dialect has."""
+
+    def __init__(self, conn: Connection):
+        self.conn = conn
+        self.dialect = conn.dialect.name
+
+    def write(self, table, columns: tuple, rows: Iterable[tuple], label: Optional[str] = None) -> int:
+        written = 0
+        batch = []
+        started = time.monotonic()
+        for row in rows:
+            batch.append(row)
+            if len(batch) == BATCH_SIZE:
+                self._flush(table, columns, batch)
+                written += len(batch)
+                batch = []
+                if label:
+                    print(f"  {label}: {written}", end="\r", flush=True)
+        if batch:
+            self._flush(table, columns, batch)
+            written += len(batch)
+        if label:
+            elapsed = time.monotonic() - started
+            rate = f", {written / elapsed * 60:,.0f} rows/min" if elapsed > 0 and written else ""
+            print(f"  {label}: {written} in {elapsed:.1f}s{rate}")
+        return written
+
+    def _flush(self, table, columns: tuple, batch: list):
+        if self.dialect == "postgresql":
+            buffer = io.StringIO()
+            # None is written as an empty unquoted field, which COPY CSV reads as NULL
+            csv.writer(buffer).writerows(batch)
+            buffer.seek(0)
+            with self.conn.connection.dbapi_connection.cursor() as cursor:
+                cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        elif self.dialect == "sqlite":
+            placeholders = ", ".join("?" for _ in columns)
+            cursor = self.conn.connection.dbapi_connection.cursor()
+            try:
+                cursor.executemany(f"INSERT INTO {table.name} ({', '.join(columns)}) VALUES ({placeholders})", batch)
+            finally:
+                cursor.close()
+        else:
+            # Untyped parameters, like the paths above: JSON columns arrive already encoded
+            placeholders = ", ".join(f":{column}" for column in columns)
+            self.conn.execute(
+                text(f"INSERT INTO {table.name} ({', '.join(columns)}) VALUES ({placeholders})"),
+                [dict(zip(columns, row)) for row in batch],
+            )
+
+
+@contextlib.contextmanager
+def without_indexes(conn: Connection, table, verbose: bool = True):
+    """
+    Drop ``table``'s non-unique indexes for the load and build them again
+    afterwards: one sorted build is much cheaper than maintaining every index
+    row by row. Holds an exclusive lock on the table until commit.
+    """
+    indexes = [index for index in table.indexes if not index.unique]
+    for index in indexes:
+        index.drop(conn)
+    yield
+    started = time.monotonic()
+    for index in indexes:
+        index.create(conn)
+    if verbose and indexes:
+        print(f"  {table.name}: rebuilt {len(indexes)} indexes in {time.monotonic() - started:.1f}s")
+
+
+def _next_id(conn: Connection, table) -> int:
+    return (conn.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+
+
+def seed_dataset(
+    engine: Engine,
+    scale: Scale,
+    seed: int = 0,
+    prefix: Optional[str] = None,
+    password: str = DEFAULT_PASSWORD,
+    reference: Optional[datetime] = None,
+    verbose: bool = True,
+) -> dict:
+    """
+    Generate and load the dataset for ``seed``. ``reference`` is the "now"
+    that creation and due dates are spread around (default: today, 00:00
+    UTC); pass a fixed one for a dataset that does not depend on the day.
+    Returns table -> rows written.
+    """
+    from .auth import pwd_context
+
+    rng = random.Random(seed)
+    rand = rng.random
+    prefix = prefix or f"seed{seed}"
+    reference = reference or datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    now = int(reference.timestamp())
+    password_hash = pwd_context.hash(password)
+    users, projects, tasks, progress, logs = (model.__table__ for model in (User, Project, Task, Progress, AdminLog))
+    written = {}
+
+    with engine.begin() as conn:
+        writer = BulkWriter(conn)
+        ts = Timestamps(writer.dialect)
+        admin_id = _next_id(conn, users)
+        first_user = admin_id + 1
+        first_project = _next_id(conn, projects)
+        first_task = _next_id(conn, tasks)
+        first_progress = _next_id(conn, progress)
+        first_log = _next_id(conn, logs)
+
+        def user_rows():
+            yield (admin_id, f"{prefix}-admin@example.com", password_hash, "Seed Admin", True, "admin", False,
+                   ts(now - 400 * DAY))
+            for i in range(scale.users):
+                # A few suspended accounts, never the first ones (benchmarks log in as user 0)
+                suspended = i % 100 == 99
+                yield (first_user + i, f"{prefix}-{i}@example.com", password_hash, f"Seed User {i}", False, "user",
+                       suspended, ts(now - int(rand() * YEAR)))
+
+        written["users"] = writer.write(
+            users, ("id", "email", "hashed_password", "full_name", "is_admin", "role", "is_suspended", "created_at"),
+            user_rows(), verbose and "users",
+        )
+
+        counts = task_counts(rng, scale.tasks, scale.projects)
+        project_ages = []
+
+        def project_rows():
+            for i, count in enumerate(counts):
+                # Every user owns at least one project when there are enough
+                owner = first_user + (i if i < scale.users else int(rand() * scale.users))
+                age = 1 + int(rand() * YEAR)
+                project_ages.append(age)
+                yield (first_project + i, f"{prefix} project {i}", f"Seeded project {i}", owner, count, ts(now - age))
+
+        written["projects"] = writer.write(
+            projects, ("id", "name", "description", "owner_id", "task_change_seq", "created_at"),
+            project_rows(), verbose and "projects",
+        )
+
+        progress_rows = []
+
+        def task_rows():
+            task_id = first_task
+            for i, count in enumerate(counts):
+                project_id = first_project + i
+                age = project_ages[i]
+                per_status = {TaskStatus.TODO: 0, TaskStatus.IN_PROGRESS: 0, TaskStatus.DONE: 0}
+                for seq in range(1, count + 1):
+                    status = _pick(TASK_STATUSES, rand())
+                    per_status[status] += 1
+                    created = now - int(rand() * age)
+                    due = scheduled = updated = None
+                    if rand() < 0.75:
+                        if status is TaskStatus.DONE:
+                            due = now - int(rand() * 180) * DAY
+                        else:
+                            due = now + (int(rand() * 120) - 30) * DAY
+                        if rand() < 0.25:
+                            scheduled = ts(due - int(rand() * 7) * DAY)
+                        due = ts(due)
+                    if status is not TaskStatus.TODO:
+                        updated = ts(created + int((now - created) * rand()))
+                    yield (
+                        task_id, f"Task {seq}", "Seeded task", status.name, due, scheduled,
+                        _pick(TASK_PRIORITIES, rand()), project_id, ts(created), updated,
+                        1 if updated is None else 2, seq,
+                    )
+                    task_id += 1
+                done = per_status[TaskStatus.DONE]
+                progress_rows.append((
+                    first_progress + i, project_id, completion_percentage(count, done), count,
+                    per_status[TaskStatus.TODO], per_status[TaskStatus.IN_PROGRESS], done,
+                ))
+
+        with without_indexes(conn, tasks, verbose):
+            written["tasks"] = writer.write(
+                tasks, ("id", "title", "description", "status", "due_date", "scheduled_day", "priority",
+                        "project_id", "created_at", "updated_at", "version", "change_seq"),
+                task_rows(), verbose and "tasks",
+            )
+        written["progress"] = writer.write(
+            progress, ("id", "project_id", "completion_percentage", "total_tasks", "todo_tasks",
+                       "in_progress_tasks", "done_tasks"),
+            progress_rows, verbose and "progress",
+        )
+
+        def log_rows():
+            for i in range(scale.admin_logs):
+                action, target_type = ADMIN_ACTIONS[int(rand() * len(ADMIN_ACTIONS))]
+                if target_type == "project":
+                    target_id = first_project + int(rand() * scale.projects)
+                else:
+                    target_id = first_user + int(rand() * scale.users)
+                yield (first_log + i, admin_id, action, target_type, target_id,
+                       f'{{"seeded": true, "action": "{action}"}}', ts(now - int(rand() * YEAR)))
+
+        with without_indexes(conn, logs, verbose):
+            written["admin_logs"] = writer.write(
+                logs, ("id", "admin_id", "action", "target_type", "target_id", "details", "created_at"),
+                log_rows(), verbose and "admin_logs",
+            )
+
+        if writer.dialect == "postgresql":
+            # Explicit ids do not advance the serial sequences
+            for table in (users, projects, tasks, progress, logs):
+                conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                    f"(SELECT max(id) FROM {table.name}))"
+                ))
+
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load a synthetic TaskFlow dataset")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--projects", type=int, default=5000)
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--admin-logs", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=0, help="random seed; same seed, same data")
+    parser.add_argument("--prefix", help="email/project name prefix (default: seed<seed>)")
+    parser.add_argument("--password", default=DEFAULT_PASSWORD, help="password of every seeded user")
+    args = parser.parse_args(argv)
+    if args.users < 1 or args.projects < 1 or args.tasks < 0 or args.admin_logs < 0:
+        parser.error("--users and --projects must be at least 1, counts not negative")
+
+    from .database import engine
+
+    prefix = args.prefix or f"seed{args.seed}"
+    with engine.connect() as conn:
+        if conn.execute(select(User.id).where(User.email == f"{prefix}-admin@example.com")).first():
+            parser.error(f"a dataset with prefix {prefix!r} is already loaded; pick another --seed or --prefix")
+
+    scale = Scale(args.users, args.projects, args.tasks, args.admin_logs)
+    print(f"Loading {asdict(scale)} into {engine.url.render_as_string(hide_password=True)}")
+    started = time.monotonic()
+    written = seed_dataset(engine, scale, args.seed, prefix, args.password)
+    elapsed = time.monotonic() - started
+    total = sum(written.values())
+    print(f"{total} rows in {elapsed:.1f}s ({total / elapsed * 60:,.0f} rows/min)")
+
+
+if __name__ == "__main__":
+    main()
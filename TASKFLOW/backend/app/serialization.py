@@ -0,0 +1,44 @@
+"""
+Fast path for list responses.
+
+A route with a ``response_model`` has FastAPI validate what it returns, run
+the result through ``jsonable_encoder`` (a pure-Python walk of every value)
+and only then render it. For list endpoints that walk dominates the request.
+
+``json_response`` instead validates the ORM rows once with a cached
+``TypeAdapter`` of the response schema and hands the python dump to orjson,
+which encodes datetimes and enums natively. The body is byte-for-byte the
+default path's (UTC written as ``Z``, like pydantic's json mode). Routes keep
+their ``response_model`` for the OpenAPI schema; returning a Response skips
+FastAPI's own pass. See benchmarks/serialization.py.
+"""
+from functools import lru_cache
+from typing import Any, Optional
+import orjson
+from fastapi import Response, status
+from pydantic import TypeAdapter
+
+
+@lru_cache(maxsize=None)
+def adapter(schema) -> TypeAdapter:
+    """TypeAdapter of ``schema`` (a model or e.g. ``List[Model]``), built once."""
+    return TypeAdapter(schema)
+
+
+def json_response(
+    schema,
+    content: Any,
+    response: Optional[Response] = None,
+    status_code: int = status.HTTP_200_OK,
+) -> Response:
+    """
+    Serialize ``content`` (ORM rows, dicts holding them, ...) as ``schema``.
+    Headers already set on the route's injected ``response`` are kept.
+    """
+    type_adapter = adapter(schema)
+    validated = type_adapter.validate_python(content, from_attributes=True)
+    body = orjson.dumps(type_adapter.dump_python(validated), option=orjson.OPT_UTC_Z)
+    headers = dict(response.headers) if response is not None else None
+    if headers:
+        headers.pop("content-length", None)
+    return Response(body, status_code=status_code, headers=headers, media_type="application/json")
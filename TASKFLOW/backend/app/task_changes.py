@@ -0,0 +1,85 @@
+"""
+Per-project change sequence for task delta sync.
+
+Every task write first advances ``projects.task_change_seq`` with one
+UPDATE ... RETURNING (which also checks ownership) and stamps the new value
+on the tasks it writes as ``tasks.change_seq``. Deleting a task, or moving it
+to another project, leaves a ``task_tombstones`` row in the project it left,
+stamped the same way.
+
+The UPDATE keeps the project row locked until the writer commits, so within
+a project sequence order is commit order: once a client has read everything
+up to N, no later commit can appear below N. GET /tasks/changes then reads
+both tables by (project_id, change_seq), in O(changes).
+"""
+import base64
+import binascii
+import json
+from typing import Iterable, Optional
+from fastapi import HTTPException, status
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+from .models import Project, Task, TaskTombstone
+
+
+def _bump(statement):
+    return statement.values(
+        task_change_seq=Project.task_change_seq + 1,
+        # Sequence bumps are not edits of the project itself
+        updated_at=Project.updated_at,
+    ).returning(Project.id, Project.task_change_seq).execution_options(synchronize_session=False)
+
+
+def bump_projects(db: Session, project_ids: Iterable[int], owner_id: Optional[int] = None) -> dict[int, int]:
+    """
+    Advance the sequence of ``project_ids`` (only those owned by
+    ``owner_id`` when given). Returns project id -> new sequence value.
+    """
+    project_ids = set(project_ids)
+    if not project_ids:
+        return {}
+    statement = update(Project).where(Project.id.in_(project_ids))
+    if owner_id is not None:
+        statement = statement.where(Project.owner_id == owner_id)
+    return dict(db.execute(_bump(statement)).all())
+
+
+def bump_task_project(db: Session, task_id: int, owner_id: Optional[int] = None) -> Optional[tuple[int, int]]:
+    """
+    Advance the sequence of the project holding ``task_id``. Returns
+    (project id, new sequence value), or None when the task does not exist
+    or ``owner_id`` does not own its project.
+    """
+    project_of_task = select(Task.project_id).where(Task.id == task_id).scalar_subquery()
+    statement = update(Project).where(Project.id == project_of_task)
+    if owner_id is not None:
+        statement = statement.where(Project.owner_id == owner_id)
+    row = db.execute(_bump(statement)).first()
+    return (row.id, row.task_change_seq) if row is not None else None
+
+
+def record_tombstones(db: Session, tombstones: Iterable[tuple[int, int, int]]):
+    """Record (task id, project id, sequence) removals in the same transaction."""
+    rows = [
+        {"task_id": task_id, "project_id": project_id, "change_seq": change_seq}
+        for task_id, project_id, change_seq in tombstones
+    ]
+    if rows:
+        db.execute(insert(TaskTombstone), rows)
+
+
+def encode_change_cursor(project_id: int, change_seq: int, row_id: int) -> str:
+    payload = {"p": project_id, "s": change_seq, "i": row_id}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_change_cursor(cursor: str, project_id: int) -> tuple[int, int]:
+    """(change_seq, id) position of a cursor issued for ``project_id``."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if int(payload["p"]) != project_id:
+            raise ValueError(payload["p"])
+        return int(payload["s"]), int(payload["i"])
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
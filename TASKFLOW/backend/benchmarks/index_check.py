@@ -0,0 +1,245 @@
+"""
+EXPLAIN every query the routers issue and fail on full table scans.
+
+Drives each route once through the app (in process, on the sync stack)
+against a migrated scratch database, records the SQL it sends, then replays
+every distinct SELECT/UPDATE/DELETE under EXPLAIN:
+
+- Postgres: ``EXPLAIN (FORMAT JSON)`` with ``enable_seqscan = off``, so a
+  ``Seq Scan`` that remains means no index can serve the predicate.
+- SQLite: ``EXPLAIN QUERY PLAN``; a ``SCAN <table>`` step without an index.
+
+    alembic upgrade head
+    python benchmarks/index_check.py --seed-tasks 500
+
+Queries that cannot use a B-tree index by design (substring search, full
+exports) are listed in ALLOWED_SCANS and reported without failing.
+Requires httpx (requirements-dev.txt). Writes test users, projects and tasks,
+so point DATABASE_URL at a scratch database.
+"""
+import argparse
+import json
+import re
+import sys
+import uuid
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.engine import make_url  # noqa: E402
+
+from app.config import settings  # noqa: E402
+
+# Replaying statements needs the paramstyle of the driver that produced them,
+# so run the app on the sync engine whatever DATABASE_URL selects.
+_url = make_url(settings.DATABASE_URL)
+if _url.get_dialect().is_async:
+    settings.DATABASE_URL = _url.set(drivername=_url.get_backend_name()).render_as_string(hide_password=False)
+settings.RATE_LIMIT_ENABLED = False
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.database import SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import User  # noqa: E402
+
+TABLES = {"users", "projects", "tasks", "task_tombstones", "progress", "admin_logs"}
+
+# reason -> pattern of the statements allowed to scan
+ALLOWED_SCANS = {
+    "substring search on email/full_name": re.compile(r"lower\(users\.email\) LIKE"),
+    # Unfiltered SELECTs in primary key order
+    "exports read the whole table": re.compile(r"^SELECT (?:(?! WHERE ).)* ORDER BY \w+\.id$"),
+}
+
+SQLITE_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+
+_route = None
+_statements: dict[str, dict] = {}
+
+
+def _record(conn, cursor, statement, parameters, context, executemany):
+    verb = statement.lstrip().split(None, 1)[0].upper()
+    if verb not in ("SELECT", "UPDATE", "DELETE") or executemany or _route is None:
+        return
+    entry = _statements.setdefault(statement, {"parameters": parameters, "routes": set()})
+    entry["routes"].add(_route)
+
+
+def _call(client, method: str, path: str, route: str = None, **kwargs):
+    global _route
+    _route = route or f"{method} {path}"
+    try:
+        response = client.request(method, path, **kwargs)
+    finally:
+        _route = None
+    if response.status_code >= 400:
+        raise SystemExit(f"{method} {path} -> {response.status_code}: {response.text}")
+    return response
+
+
+def drive(client: TestClient, seed_tasks: int):
+    """Exercise every route once, as a user and as an admin."""
+    suffix = uuid.uuid4().hex[:8]
+    password = "index-check-pw"
+    emails = {"user": f"check-{suffix}@example.com", "admin": f"check-admin-{suffix}@example.com"}
+    for email in emails.values():
+        client.post("/api/v1/users/register", json={"email": email, "password": password, "full_name": "Index Check"})
+    db = SessionLocal()
+    try:
+        admin = db.query(User).filter(User.email == emails["admin"]).one()
+        admin.is_admin = True
+        admin.role = "admin"
+        db.commit()
+    finally:
+        db.close()
+
+    headers = {}
+    for name, email in emails.items():
+        token = _call(client, "POST", "/api/v1/users/login", data={"username": email, "password": password}).json()
+        headers[name] = {"Authorization": f"Bearer {token['access_token']}"}
+    user, admin = headers["user"], headers["admin"]
+
+    project = _call(client, "POST", "/api/v1/projects/", json={"name": "index check"}, headers=user).json()
+    pid = project["id"]
+    statuses = ("todo", "in_progress", "done")
+    for start in range(0, seed_tasks, 500):
+        operations = [
+            {"op": "create", "project_id": pid, "title": f"task {i}", "status": statuses[i % 3]}
+            for i in range(start, min(start + 500, seed_tasks))
+        ]
+        _call(client, "POST", "/api/v1/tasks/bulk", json={"operations": operations}, headers=user)
+    task = _call(client, "POST", "/api/v1/tasks/", json={"title": "t", "project_id": pid}, headers=user).json()
+    tid = task["id"]
+
+    _call(client, "GET", "/api/v1/users/me", headers=user)
+    _call(client, "PUT", "/api/v1/users/me", json={"full_name": "Index Check 2"}, headers=user)
+    _call(client, "GET", "/api/v1/projects/", headers=user)
+    _call(client, "GET", "/api/v1/projects/summary", headers=user)
+    _call(client, "GET", f"/api/v1/projects/{pid}", "GET /api/v1/projects/{id}", headers=user)
+    _call(client, "PUT", f"/api/v1/projects/{pid}", "PUT /api/v1/projects/{id}", json={"name": "renamed"}, headers=user)
+    _call(client, "GET", f"/api/v1/tasks/project/{pid}", "GET /api/v1/tasks/project/{id}", headers=user)
+    _call(client, "GET", f"/api/v1/tasks/{tid}", "GET /api/v1/tasks/{id}", headers=user)
+    _call(client, "PUT", f"/api/v1/tasks/{tid}", "PUT /api/v1/tasks/{id}", json={"status": "done"}, headers=user)
+    _call(client, "POST", "/api/v1/tasks/bulk", json={"operations": [
+        {"op": "move", "id": tid, "status": "in_progress"},
+        {"op": "update", "id": tid, "title": "bulk"},
+    ]}, headers=user)
+    changes = _call(client, "GET", "/api/v1/tasks/changes", params={"project_id": pid, "limit": 50}, headers=user).json()
+    _call(client, "GET", "/api/v1/tasks/changes", "GET /api/v1/tasks/changes (cursor)",
+          params={"project_id": pid, "since": changes["cursor"]}, headers=user)
+    _call(client, "GET", f"/api/v1/progress/project/{pid}", "GET /api/v1/progress/project/{id}", headers=user)
+    _call(client, "GET", "/api/v1/progress/", headers=user)
+
+    for path in ("/api/v1/users/", "/api/v1/admin/users", "/api/v1/admin/projects",
+                 "/api/v1/admin/tasks", "/api/v1/admin/logs"):
+        page = _call(client, "GET", path, params={"per_page": 5}, headers=admin).json()
+        if page["next_cursor"]:
+            _call(client, "GET", path, f"GET {path} (cursor)", params={"per_page": 5, "cursor": page["next_cursor"]}, headers=admin)
+    _call(client, "GET", "/api/v1/users/", params={"q": "check"}, headers=admin)
+    _call(client, "GET", "/api/v1/admin/users", params={"q": "check"}, headers=admin)
+    _call(client, "GET", "/api/v1/admin/stats", params={"refresh": True}, headers=admin)
+    _call(client, "GET", "/api/v1/users/export", headers=admin)
+    _call(client, "GET", "/api/v1/admin/projects/export", headers=admin)
+    _call(client, "GET", "/api/v1/admin/tasks/export", params={"gzip": True}, headers=admin)
+    _call(client, "GET", f"/api/v1/admin/projects/{pid}/tasks", "GET /api/v1/admin/projects/{id}/tasks", headers=admin)
+
+    user_id = _call(client, "GET", "/api/v1/users/me", headers=user).json()["id"]
+    _call(client, "PATCH", f"/api/v1/admin/users/{user_id}/suspend", "PATCH /api/v1/admin/users/{id}/suspend", params={"is_suspended": True}, headers=admin)
+    _call(client, "PATCH", f"/api/v1/admin/users/{user_id}/suspend", "PATCH /api/v1/admin/users/{id}/suspend", params={"is_suspended": False}, headers=admin)
+    _call(client, "PATCH", f"/api/v1/admin/users/{user_id}/admin", "PATCH /api/v1/admin/users/{id}/admin", params={"is_admin": True}, headers=admin)
+    _call(client, "PATCH", f"/api/v1/admin/users/{user_id}/admin", "PATCH /api/v1/admin/users/{id}/admin", params={"is_admin": False}, headers=admin)
+    _call(client, "POST", f"/api/v1/admin/users/{user_id}/reset-password", "POST /api/v1/admin/users/{id}/reset-password",
+          params={"new_password": password}, headers=admin)
+    _call(client, "PUT", f"/api/v1/users/{user_id}", "PUT /api/v1/users/{id}", json={"full_name": "Index Check 3"}, headers=admin)
+    _call(client, "DELETE", f"/api/v1/admin/tasks/{tid}", "DELETE /api/v1/admin/tasks/{id}", headers=admin)
+
+    # The admin actions above revoked the user's tokens
+    token = _call(client, "POST", "/api/v1/users/login", data={"username": emails["user"], "password": password}).json()
+    user = {"Authorization": f"Bearer {token['access_token']}"}
+
+    other = _call(client, "POST", "/api/v1/tasks/", json={"title": "t2", "project_id": pid}, headers=user).json()
+    _call(client, "DELETE", f"/api/v1/tasks/{other['id']}", "DELETE /api/v1/tasks/{id}", headers=user)
+    _call(client, "DELETE", f"/api/v1/projects/{pid}", "DELETE /api/v1/projects/{id}", headers=user)
+    second = _call(client, "POST", "/api/v1/projects/", json={"name": "index check 2"}, headers=user).json()
+    _call(client, "DELETE", f"/api/v1/admin/projects/{second['id']}", "DELETE /api/v1/admin/projects/{id}", headers=admin)
+    _call(client, "DELETE", f"/api/v1/admin/users/{user_id}", "DELETE /api/v1/admin/users/{id}", headers=admin)
+
+
+def _postgres_scans(connection, statement, parameters) -> list[str]:
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+        plan = cursor.fetchone()[0]
+    finally:
+        cursor.close()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    scans = []
+    nodes = [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in TABLES:
+            scans.append(node["Relation Name"])
+        nodes.extend(node.get("Plans", []))
+    return scans
+
+
+def _sqlite_scans(connection, statement, parameters) -> list[str]:
+    cursor = connection.connection.cursor()
+    try:
+        rows = cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    finally:
+        cursor.close()
+    scans = []
+    for row in rows:
+        match = SQLITE_SCAN.match(row[-1])
+        if match and match.group(1) in TABLES:
+            scans.append(match.group(1))
+    return scans
+
+
+def explain_all() -> list[dict]:
+    explain = _postgres_scans if engine.dialect.name == "postgresql" else _sqlite_scans
+    report = []
+    with engine.connect() as connection:
+        for statement, entry in _statements.items():
+            with connection.begin():
+                scans = explain(connection, statement, entry["parameters"])
+            if scans:
+                report.append({"statement": " ".join(statement.split()), "tables": sorted(set(scans)),
+                               "routes": sorted(entry["routes"])})
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed-tasks", type=int, default=500, help="tasks created in the check project")
+    args = parser.parse_args()
+
+    if engine.dialect.name not in ("postgresql", "sqlite"):
+        raise SystemExit(f"Unsupported database: {engine.dialect.name}")
+
+    event.listen(engine, "before_cursor_execute", _record)
+    with TestClient(app) as client:
+        drive(client, args.seed_tasks)
+    event.remove(engine, "before_cursor_execute", _record)
+
+    report = explain_all()
+    failures = 0
+    for item in report:
+        reason = next((reason for reason, pattern in ALLOWED_SCANS.items() if pattern.search(item["statement"])), None)
+        failures += reason is None
+        print(f"allowed ({reason})" if reason else "FULL SCAN", f"on {', '.join(item['tables'])}")
+        print(f"  routes: {'; '.join(item['routes'])}")
+        print(f"  {item['statement']}")
+    print(f"{len(_statements)} statements checked, {failures} full scan(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,502 @@
+"""
+Latency, queries per request and throughput of every API route on a seeded,
+reproducible dataset.
+
+Loads a synthetic dataset at the requested scale into DATABASE_URL with
+app.seed (users, projects with tasks and their progress rows, admin logs),
+then drives each route ``--requests`` times:
+
+- in process, through the ASGI app with one client, counting the SQL
+  statements each request sends;
+- over HTTP against a uvicorn worker, with ``--http-clients`` concurrent
+  clients (``--no-http`` to skip).
+
+and reports p50/p95/p99 latency, queries per request and requests/s.
+
+    alembic upgrade head
+    python benchmarks/routes.py --users 10000 --projects 100000 \\
+        --tasks 5000000 --admin-logs 1000000 --output baseline.json
+    # after a change, against the same database
+    python benchmarks/routes.py ... --output after.json --baseline baseline.json
+
+The dataset is generated from ``--seed`` and is only written once per
+database: later runs with the same seed reuse it, so use a fresh database for
+another scale. Writes made by the run itself (tasks, projects, users) go to
+scratch rows that are removed afterwards, except the admin log entries the
+admin routes add. With ``--baseline`` the run is compared route by route and
+exits with status 1 when a route's p95 latency grew by more than
+``--threshold`` or it sends more queries than before.
+
+The event streams (/api/v1/events) are long-lived and not measured here.
+Requires httpx (requirements-dev.txt).
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import httpx  # noqa: E402
+from sqlalchemy import event, insert, select  # noqa: E402
+
+from app.config import settings  # noqa: E402
+
+# One client hammering a route would only measure the rate limiter
+settings.RATE_LIMIT_ENABLED = False
+
+from app import database  # noqa: E402
+from app.auth import pwd_context  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import User  # noqa: E402
+from app.seed import Scale, seed_dataset  # noqa: E402
+from concurrency import start_server, wait_ready  # noqa: E402
+
+API = "/api/v1"
+PASSWORD = "bench-password"
+# Dates are spread around a fixed day so the dataset does not depend on when
+# it was loaded
+EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+# ==================== DATASET ====================
+
+def ensure_dataset(engine, scale: Scale, seed: int):
+    with engine.connect() as conn:
+        seeded = conn.execute(select(User.id).where(User.email == f"bench{seed}-admin@example.com")).first()
+    if seeded:
+        print(f"Dataset for seed {seed} already present, reusing it")
+        return
+    print(f"Seeding {scale} (seed {seed})")
+    started = time.monotonic()
+    seed_dataset(engine, scale, seed, prefix=f"bench{seed}", password=PASSWORD, reference=EPOCH)
+    print(f"Seeded in {time.monotonic() - started:.1f}s")
+
+
+def insert_users(engine, count: int) -> list[int]:
+    """Throwaway users for the routes that modify or delete one."""
+    password_hash = pwd_context.hash(PASSWORD)
+    rows = [
+        {"email": f"bench-scratch-{uuid.uuid4().hex[:12]}@example.com", "hashed_password": password_hash,
+         "full_name": "Bench Scratch", "is_admin": False, "role": "user", "is_suspended": False}
+        for _ in range(count)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), rows)
+        emails = [row["email"] for row in rows]
+        return list(conn.execute(select(User.id).where(User.email.in_(emails))).scalars())
+
+
+# ==================== ROUTES ====================
+
+Prepare = Callable[[httpx.AsyncClient, dict, int], Awaitable[list[dict]]]
+
+
+@dataclass
+class Route:
+    """
+    One benchmarked route. ``build(ctx)`` returns (method, path, request
+    kwargs); ``prepare`` creates what ``count`` requests consume (untimed) and
+    returns one ctx update per request.
+    """
+    name: str
+    build: Callable[[dict], tuple]
+    admin: bool = False
+    prepare: Optional[Prepare] = None
+    max_requests: Optional[int] = None
+
+
+def _request(route: Route, ctx: dict, headers: dict) -> tuple:
+    """(method, path, kwargs) of one request, with the route's extra headers merged in."""
+    method, path, kwargs = route.build(ctx)
+    kwargs = dict(kwargs)
+    kwargs["headers"] = {**headers, **kwargs.get("headers", {})}
+    return method, path, kwargs
+
+
+async def _ok(response: httpx.Response) -> httpx.Response:
+    if response.status_code >= 400:
+        raise SystemExit(f"{response.request.method} {response.request.url} -> {response.status_code}: {response.text}")
+    return response
+
+
+async def _bulk_create_tasks(client, ctx, count: int) -> list[dict]:
+    results = []
+    for start in range(0, count, 1000):
+        operations = [
+            {"op": "create", "project_id": ctx["scratch_project"], "title": f"bench {i}"}
+            for i in range(start, min(count, start + 1000))
+        ]
+        response = await _ok(await client.post(f"{API}/tasks/bulk", json={"operations": operations}, headers=ctx["user"]))
+        results.extend({"task_id": result["id"]} for result in response.json()["results"])
+    return results
+
+
+async def _create_projects(client, ctx, count: int) -> list[dict]:
+    created = []
+    for i in range(count):
+        response = await _ok(await client.post(f"{API}/projects/", json={"name": f"bench scratch {i}"}, headers=ctx["user"]))
+        created.append({"delete_project": response.json()["id"]})
+    return created
+
+
+async def _scratch_users(client, ctx, count: int) -> list[dict]:
+    ids = await asyncio.to_thread(insert_users, database.engine, count)
+    return [{"delete_user": user_id} for user_id in ids]
+
+
+async def _register_emails(client, ctx, count: int) -> list[dict]:
+    return [{"email": f"bench-register-{uuid.uuid4().hex[:12]}@example.com"} for _ in range(count)]
+
+
+async def _task_etag(client, ctx, count: int) -> list[dict]:
+    response = await _ok(await client.get(f"{API}/tasks/project/{ctx['project']}", headers=ctx["user"]))
+    return [{"etag": response.headers["etag"]}] * count
+
+
+async def _change_cursor(client, ctx, count: int) -> list[dict]:
+    response = await _ok(await client.get(f"{API}/tasks/changes", params={"project_id": ctx["project"]}, headers=ctx["user"]))
+    return [{"cursor": response.json()["cursor"]}] * count
+
+
+def routes() -> list[Route]:
+    def get(path, **kwargs):
+        return lambda ctx: ("GET", path.format(**ctx), kwargs)
+
+    return [
+        Route("GET /health", lambda ctx: ("GET", "/health", {})),
+        # Users
+        Route("POST /users/register", lambda ctx: ("POST", f"{API}/users/register", {
+            "json": {"email": ctx["email"], "password": PASSWORD}}), prepare=_register_emails, max_requests=20),
+        Route("POST /users/login", lambda ctx: ("POST", f"{API}/users/login", {
+            "data": {"username": ctx["user_email"], "password": PASSWORD}}), max_requests=20),
+        Route("GET /users/me", get(API + "/users/me")),
+        Route("PUT /users/me", lambda ctx: ("PUT", f"{API}/users/me", {"json": {"full_name": "Bench User"}})),
+        Route("GET /users/", get(API + "/users/"), admin=True),
+        Route("GET /users/?q=", get(API + "/users/", params={"q": "seed user 1"}), admin=True),
+        Route("GET /users/export", get(API + "/users/export"), admin=True, max_requests=3),
+        Route("PUT /users/{id}", lambda ctx: ("PUT", f"{API}/users/{ctx['spare_user']}", {
+            "json": {"full_name": "Bench Spare"}}), admin=True),
+        Route("DELETE /users/{id}", lambda ctx: ("DELETE", f"{API}/users/{ctx['delete_user']}", {}),
+              admin=True, prepare=_scratch_users),
+        # Projects
+        Route("POST /projects/", lambda ctx: ("POST", f"{API}/projects/", {"json": {"name": "bench"}})),
+        Route("GET /projects/", get(API + "/projects/")),
+        Route("GET /projects/summary", get(API + "/projects/summary")),
+        Route("GET /projects/{id}", get(API + "/projects/{project}")),
+        Route("PUT /projects/{id}", lambda ctx: ("PUT", f"{API}/projects/{ctx['scratch_project']}", {
+            "json": {"description": "bench"}})),
+        Route("DELETE /projects/{id}", lambda ctx: ("DELETE", f"{API}/projects/{ctx['delete_project']}", {}),
+              prepare=_create_projects),
+        # Tasks
+        Route("POST /tasks/", lambda ctx: ("POST", f"{API}/tasks/", {
+            "json": {"title": "bench", "project_id": ctx["scratch_project"]}})),
+        Route("POST /tasks/bulk", lambda ctx: ("POST", f"{API}/tasks/bulk", {"json": {"operations": [
+            {"op": "create", "project_id": ctx["scratch_project"], "title": f"bulk {i}"} for i in range(100)
+        ]}})),
+        Route("GET /tasks/project/{id}", get(API + "/tasks/project/{project}")),
+        Route("GET /tasks/project/{id} (304)", lambda ctx: ("GET", f"{API}/tasks/project/{ctx['project']}", {
+            "headers": {"If-None-Match": ctx["etag"]}}), prepare=_task_etag),
+        Route("GET /tasks/changes", lambda ctx: ("GET", f"{API}/tasks/changes", {"params": {"project_id": ctx["project"]}})),
+        Route("GET /tasks/changes (cursor)", lambda ctx: ("GET", f"{API}/tasks/changes", {
+            "params": {"project_id": ctx["project"], "since": ctx["cursor"]}}), prepare=_change_cursor),
+        Route("GET /tasks/{id}", get(API + "/tasks/{task}")),
+        Route("PUT /tasks/{id}", lambda ctx: ("PUT", f"{API}/tasks/{ctx['scratch_task']}", {
+            "json": {"description": "bench"}})),
+        Route("DELETE /tasks/{id}", lambda ctx: ("DELETE", f"{API}/tasks/{ctx['task_id']}", {}),
+              prepare=_bulk_create_tasks),
+        # Progress
+        Route("GET /progress/project/{id}", get(API + "/progress/project/{project}")),
+        Route("GET /progress/", get(API + "/progress/")),
+        # Admin
+        Route("GET /admin/stats", get(API + "/admin/stats"), admin=True),
+        Route("GET /admin/db-pool", get(API + "/admin/db-pool"), admin=True),
+        Route("GET /admin/users", get(API + "/admin/users"), admin=True),
+        Route("GET /admin/users?q=", get(API + "/admin/users", params={"q": "seed user 1"}), admin=True),
+        Route("PATCH /admin/users/{id}/admin", lambda ctx: ("PATCH", f"{API}/admin/users/{ctx['spare_user']}/admin", {
+            "params": {"is_admin": False}}), admin=True),
+        Route("PATCH /admin/users/{id}/suspend", lambda ctx: ("PATCH", f"{API}/admin/users/{ctx['spare_user']}/suspend", {
+            "params": {"is_suspended": False}}), admin=True),
+        Route("POST /admin/users/{id}/reset-password", lambda ctx: (
+            "POST", f"{API}/admin/users/{ctx['spare_user']}/reset-password", {"params": {"new_password": PASSWORD}}),
+            admin=True, max_requests=20),
+        Route("DELETE /admin/users/{id}", lambda ctx: ("DELETE", f"{API}/admin/users/{ctx['delete_user']}", {}),
+              admin=True, prepare=_scratch_users),
+        Route("GET /admin/projects", get(API + "/admin/projects"), admin=True),
+        Route("GET /admin/projects/export", get(API + "/admin/projects/export"), admin=True, max_requests=3),
+        Route("DELETE /admin/projects/{id}", lambda ctx: ("DELETE", f"{API}/admin/projects/{ctx['delete_project']}", {}),
+              admin=True, prepare=_create_projects),
+        Route("GET /admin/projects/{id}/tasks", get(API + "/admin/projects/{project}/tasks"), admin=True),
+        Route("GET /admin/tasks", get(API + "/admin/tasks", params={"per_page": 1000}), admin=True),
+        Route("GET /admin/tasks/export", get(API + "/admin/tasks/export"), admin=True, max_requests=3),
+        Route("DELETE /admin/tasks/{id}", lambda ctx: ("DELETE", f"{API}/admin/tasks/{ctx['task_id']}", {}),
+              admin=True, prepare=_bulk_create_tasks),
+        Route("GET /admin/logs", get(API + "/admin/logs"), admin=True),
+    ]
+
+
+# ==================== RUNNER ====================
+
+class QueryCounter:
+    """Counts statements sent by this process (exact with one client at a time)."""
+
+    def __init__(self):
+        self.count = 0
+        self.engines = [database.engine] + ([database.async_engine.sync_engine] if database.async_engine else [])
+
+    def _count(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        for engine in self.engines:
+            event.listen(engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc):
+        for engine in self.engines:
+            event.remove(engine, "before_cursor_execute", self._count)
+
+
+async def login(client, email: str) -> dict:
+    response = await _ok(await client.post(f"{API}/users/login", data={"username": email, "password": PASSWORD}))
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def make_context(client, seed: int) -> dict:
+    """Tokens, the benchmark user's first project and scratch rows for writes."""
+    user_email = f"bench{seed}-0@example.com"
+    ctx = {
+        "seeded_project_prefix": f"bench{seed} project ",
+        "user_email": user_email,
+        "user": await login(client, user_email),
+        "admin": await login(client, f"bench{seed}-admin@example.com"),
+    }
+    projects = (await _ok(await client.get(f"{API}/projects/", headers=ctx["user"]))).json()
+    ctx["project"] = min(project["id"] for project in projects if project["name"].startswith(ctx["seeded_project_prefix"]))
+    tasks = (await _ok(await client.get(f"{API}/tasks/project/{ctx['project']}", headers=ctx["user"]))).json()
+    if not tasks:
+        tasks = [(await _ok(await client.post(f"{API}/tasks/", json={"title": "bench", "project_id": ctx["project"]},
+                                              headers=ctx["user"]))).json()]
+    ctx["task"] = tasks[0]["id"]
+    scratch = await _ok(await client.post(f"{API}/projects/", json={"name": "bench scratch"}, headers=ctx["user"]))
+    ctx["scratch_project"] = scratch.json()["id"]
+    scratch_task = await _ok(await client.post(f"{API}/tasks/", json={"title": "bench", "project_id": ctx["scratch_project"]},
+                                               headers=ctx["user"]))
+    ctx["scratch_task"] = scratch_task.json()["id"]
+    ctx["spare_user"] = (await asyncio.to_thread(insert_users, database.engine, 1))[0]
+    return ctx
+
+
+async def drop_context(client, ctx: dict):
+    # Projects POST /projects/ created; the scratch project takes its tasks along
+    projects = (await _ok(await client.get(f"{API}/projects/", headers=ctx["user"]))).json()
+    for project in projects:
+        if not project["name"].startswith(ctx["seeded_project_prefix"]):
+            await client.delete(f"{API}/projects/{project['id']}", headers=ctx["user"])
+    await client.delete(f"{API}/admin/users/{ctx['spare_user']}", headers=ctx["admin"])
+    users = (await _ok(await client.get(f"{API}/admin/users", params={"q": "bench-register-", "per_page": 200},
+                                        headers=ctx["admin"]))).json()
+    for user in users["items"]:
+        await client.delete(f"{API}/admin/users/{user['id']}", headers=ctx["admin"])
+
+
+def _percentile(latencies: list[float], p: float) -> Optional[float]:
+    if not latencies:
+        return None
+    return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2)
+
+
+async def run_route(client, route: Route, ctx: dict, requests: int, clients: int,
+                    counter: Optional[QueryCounter]) -> dict:
+    count = min(requests, route.max_requests or requests)
+    headers = ctx["admin"] if route.admin else ctx["user"]
+    if route.prepare:
+        contexts = [{**ctx, **update} for update in await route.prepare(client, ctx, count)]
+    else:
+        # Two untimed requests warm caches and connections
+        for _ in range(min(2, count)):
+            method, path, kwargs = _request(route, ctx, headers)
+            await client.request(method, path, **kwargs)
+        contexts = [ctx] * count
+
+    latencies, queries = [], []
+    errors = 0
+    pending = iter(contexts)
+
+    async def worker():
+        nonlocal errors
+        for request_ctx in pending:
+            method, path, kwargs = _request(route, request_ctx, headers)
+            before = counter.count if counter else 0
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                await response.aread()
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            elapsed = time.perf_counter() - started
+            if not ok:
+                errors += 1
+                continue
+            latencies.append(elapsed)
+            if counter:
+                queries.append(counter.count - before)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "route": route.name,
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": _percentile(latencies, 0.50),
+        "p95_ms": _percentile(latencies, 0.95),
+        "p99_ms": _percentile(latencies, 0.99),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else None,
+        "rps": round(len(latencies) / wall, 1) if wall else None,
+        "queries_per_request": round(statistics.fmean(queries), 2) if queries else None,
+    }
+
+
+async def drive(client, mode: str, args, selected: list[Route], clients: int = 1,
+                counter: Optional[QueryCounter] = None) -> list[dict]:
+    ctx = await make_context(client, args.seed)
+    results = []
+    try:
+        for route in selected:
+            result = {"mode": mode, **await run_route(client, route, ctx, args.requests, clients, counter)}
+            print(
+                f"{mode:>10}  {route.name:<42} p50 {result['p50_ms']:>8} ms  p95 {result['p95_ms']:>8} ms  "
+                f"p99 {result['p99_ms']:>8} ms  {result['rps']:>8} req/s  "
+                f"queries {result['queries_per_request']}  errors {result['errors']}",
+                flush=True,
+            )
+            results.append(result)
+    finally:
+        await drop_context(client, ctx)
+    return results
+
+
+async def run_in_process(args, selected: list[Route]) -> list[dict]:
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            with QueryCounter() as counter:
+                return await drive(client, "in-process", args, selected, counter=counter)
+
+
+async def run_http(args, selected: list[Route]) -> list[dict]:
+    base_url = f"http://127.0.0.1:{args.port}"
+    server = start_server(settings.DATABASE_URL, args.port)
+    try:
+        await wait_ready(base_url)
+        limits = httpx.Limits(max_connections=args.http_clients, max_keepalive_connections=args.http_clients)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as client:
+            return await drive(client, "http", args, selected, clients=args.http_clients)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+# ==================== BASELINE ====================
+
+def compare(results: list[dict], baseline: list[dict], threshold: float) -> int:
+    """Print per-route changes against ``baseline``; returns the number of regressions."""
+    previous = {(item["mode"], item["route"]): item for item in baseline}
+    regressions = 0
+    print(f"\n{'mode':>10}  {'route':<42} {'p95 before':>11} {'p95 after':>10} {'change':>8}  queries")
+    for item in results:
+        before = previous.get((item["mode"], item["route"]))
+        if before is None or before["p95_ms"] is None or item["p95_ms"] is None:
+            continue
+        change = (item["p95_ms"] - before["p95_ms"]) / before["p95_ms"] if before["p95_ms"] else 0.0
+        more_queries = (
+            item["queries_per_request"] is not None and before["queries_per_request"] is not None
+            and item["queries_per_request"] > before["queries_per_request"]
+        )
+        # Sub-millisecond differences are noise whatever the ratio
+        slower = change > threshold and item["p95_ms"] - before["p95_ms"] > 1.0
+        flag = "REGRESSION" if slower or more_queries else ("faster" if change < -threshold else "")
+        regressions += bool(slower or more_queries)
+        print(
+            f"{item['mode']:>10}  {item['route']:<42} {before['p95_ms']:>9} ms {item['p95_ms']:>7} ms "
+            f"{change:>+8.0%}  {before['queries_per_request']} -> {item['queries_per_request']}  {flag}"
+        )
+    return regressions
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--projects", type=int, default=5000)
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--admin-logs", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=42, help="dataset and scratch naming seed")
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per route")
+    parser.add_argument("--http-clients", type=int, default=10, help="concurrent clients over HTTP")
+    parser.add_argument("--no-http", action="store_true", help="only measure in process")
+    parser.add_argument("--routes", help="only routes whose name contains this text")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="p95 growth counted as a regression")
+    args = parser.parse_args(argv)
+
+    if min(args.users, args.projects) < 1 or args.tasks < 0 or args.admin_logs < 0:
+        raise SystemExit("--users and --projects must be at least 1")
+    scale = Scale(args.users, args.projects, args.tasks, args.admin_logs)
+    ensure_dataset(database.engine, scale, args.seed)
+
+    selected = [route for route in routes() if not args.routes or args.routes in route.name]
+    results = asyncio.run(run_in_process(args, selected))
+    if not args.no_http:
+        results += asyncio.run(run_http(args, selected))
+
+    report = {
+        "meta": {
+            "database": database.engine.dialect.name,
+            "async_stack": database.is_async,
+            "scale": vars(scale),
+            "seed": args.seed,
+            "requests": args.requests,
+            "http_clients": args.http_clients,
+            "revision": _git_revision(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        },
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        for key in ("database", "async_stack", "scale"):
+            if baseline["meta"].get(key) != report["meta"][key]:
+                print(f"warning: baseline {key} {baseline['meta'].get(key)} differs from this run's {report['meta'][key]}")
+        regressions = compare(results, baseline["results"], args.threshold)
+        print(f"{regressions} regression(s) against {args.baseline}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Per-item cost of turning ORM rows into a JSON list response body.
+
+Compares, for TaskResponse, UserResponse and AdminLogResponse:
+
+- fastapi: what a route with ``response_model=List[...]`` did before,
+  FastAPI's serialize_response (validation + jsonable_encoder) rendered by
+  JSONResponse
+- orjson: the same with ORJSONResponse, the app's default response class
+- adapter: app.serialization, a cached TypeAdapter validating and dumping
+  straight to JSON bytes
+
+    python benchmarks/serialization.py --items 1000 --repeat 20
+
+Needs no database: rows are transient ORM instances.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+from app.models import AdminLog, Task, TaskStatus, User  # noqa: E402
+from app.schemas import AdminLogResponse, TaskResponse, UserResponse  # noqa: E402
+from app.serialization import json_response  # noqa: E402
+
+NOW = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def tasks(n: int) -> list:
+    statuses = list(TaskStatus)
+    return [
+        Task(
+            id=i, project_id=1, title=f"task {i}", description="x" * 80, status=statuses[i % 3],
+            due_date=NOW + timedelta(days=i % 30), scheduled_day=None, priority="medium",
+            version=1, created_at=NOW, updated_at=NOW,
+        )
+        for i in range(n)
+    ]
+
+
+def users(n: int) -> list:
+    return [
+        User(
+            id=i, email=f"user{i}@example.com", full_name=f"User {i}", is_admin=False,
+            role="user", is_suspended=False, created_at=NOW,
+        )
+        for i in range(n)
+    ]
+
+
+def logs(n: int) -> list:
+    return [
+        AdminLog(
+            id=i, admin_id=1, action="suspend_user", target_type="user", target_id=i,
+            details={"is_suspended": True}, created_at=NOW,
+        )
+        for i in range(n)
+    ]
+
+
+def fastapi_default(schema, rows, response_class=JSONResponse) -> bytes:
+    field = create_response_field(name="Response", type_=List[schema])
+    content = asyncio.run(serialize_response(field=field, response_content=rows))
+    return response_class(content).body
+
+
+def adapter(schema, rows) -> bytes:
+    return json_response(List[schema], rows).body
+
+
+def measure(fn, schema, rows, repeat: int) -> float:
+    """Median microseconds per item over ``repeat`` runs."""
+    fn(schema, rows)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(schema, rows)
+        samples.append((time.perf_counter() - start) / len(rows) * 1e6)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1000, help="rows per list")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    methods = {
+        "fastapi": fastapi_default,
+        "orjson": lambda schema, rows: fastapi_default(schema, rows, ORJSONResponse),
+        "adapter": adapter,
+    }
+    cases = {TaskResponse: tasks, UserResponse: users, AdminLogResponse: logs}
+    results = []
+    for schema, make_rows in cases.items():
+        rows = make_rows(args.items)
+        # Same document whichever way it is produced
+        expected = jsonable_encoder([schema.model_validate(row) for row in rows])
+        for name, fn in methods.items():
+            assert json.loads(fn(schema, rows)) == json.loads(json.dumps(expected)), (schema, name)
+        timings = {name: measure(fn, schema, rows, args.repeat) for name, fn in methods.items()}
+        results.append({"schema": schema.__name__, "items": args.items, "us_per_item": timings})
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'schema':<18}" + "".join(f"{name:>12}" for name in methods) + f"{'speedup':>10}")
+    for result in results:
+        timings = result["us_per_item"]
+        print(
+            f"{result['schema']:<18}" + "".join(f"{timings[name]:>10.2f}us" for name in methods)
+            + f"{timings['fastapi'] / timings['adapter']:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
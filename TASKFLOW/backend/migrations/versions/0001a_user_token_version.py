@@ -0,0 +1,30 @@
+"""user token version
+
+Adds users.token_version, the access token claim that lets tokens be
+revoked (see app.principals). Existing users start at 0.
+
+Revision ID: 0001a
+Revises: 0001
+Create Date: 2026-10-17 03:41:05.204871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001a'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('token_version')
@@ -0,0 +1,67 @@
+"""progress task counters
+
+Adds the per-status task counters of progress that task writes maintain
+incrementally (see app.progress_counters), and fills them in from the tasks
+table for existing progress rows, since later writes only apply deltas.
+Projects without a progress row get one on their first task write.
+
+Revision ID: 0001b
+Revises: 0001a
+Create Date: 2026-10-17 03:44:51.736102
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001b'
+down_revision: Union[str, None] = '0001a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COUNTERS = ('total_tasks', 'todo_tasks', 'in_progress_tasks', 'done_tasks')
+# Counter column for each stored task status; total_tasks counts them all
+STATUS_COUNTERS = {'todo_tasks': 'TODO', 'in_progress_tasks': 'IN_PROGRESS', 'done_tasks': 'DONE'}
+
+progress = sa.table(
+    'progress',
+    sa.column('project_id', sa.Integer()),
+    sa.column('completion_percentage', sa.Float()),
+    *(sa.column(column, sa.Integer()) for column in COUNTERS),
+)
+tasks = sa.table('tasks', sa.column('project_id', sa.Integer()), sa.column('status', sa.String()))
+
+
+def _task_count(*criteria):
+    return (
+        sa.select(sa.func.count())
+        .select_from(tasks)
+        .where(tasks.c.project_id == progress.c.project_id, *criteria)
+        .scalar_subquery()
+    )
+
+
+def upgrade() -> None:
+    for column in COUNTERS:
+        op.add_column('progress', sa.Column(column, sa.Integer(), server_default='0', nullable=False))
+
+    values = {column: _task_count(tasks.c.status == status) for column, status in STATUS_COUNTERS.items()}
+    values['total_tasks'] = _task_count()
+    op.execute(progress.update().values(values))
+    op.execute(
+        progress.update().values(
+            completion_percentage=sa.case(
+                (progress.c.total_tasks > 0, progress.c.done_tasks * 100.0 / progress.c.total_tasks),
+                else_=0.0,
+            )
+        )
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('progress') as batch_op:
+        for column in reversed(COUNTERS):
+            batch_op.drop_column(column)
@@ -0,0 +1,49 @@
+"""access path indexes
+
+Indexes for the queries the routers actually issue (see
+benchmarks/index_check.py). progress(project_id) is already served by the
+unique constraint from the baseline, so it gets no second index.
+
+On Postgres the indexes are built CONCURRENTLY, outside a transaction, so
+writes are not blocked while a large table is indexed.
+
+Revision ID: 0002
+Revises: 0001b
+Create Date: 2026-10-17 03:52:11.318114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_tasks_project_id_status', 'tasks', ['project_id', 'status']),
+    ('ix_tasks_project_id_created_at', 'tasks', ['project_id', 'created_at']),
+    ('ix_tasks_due_date', 'tasks', ['due_date']),
+    ('ix_tasks_updated_at', 'tasks', ['updated_at']),
+    ('ix_projects_owner_id_created_at', 'projects', ['owner_id', 'created_at']),
+    # Keyset pagination on (created_at, id)
+    ('ix_users_created_at_id', 'users', ['created_at', 'id']),
+    ('ix_projects_created_at_id', 'projects', ['created_at', 'id']),
+    ('ix_tasks_created_at_id', 'tasks', ['created_at', 'id']),
+    ('ix_admin_logs_created_at_id', 'admin_logs', ['created_at', 'id']),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
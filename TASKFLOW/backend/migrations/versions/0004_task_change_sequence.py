@@ -0,0 +1,58 @@
+"""task change sequence and tombstones
+
+Adds the per-project change sequence used by GET /tasks/changes (see
+app.task_changes). Existing tasks keep change_seq 0, which a client's first
+sync (without a cursor) still returns.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 05:12:44.630519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('projects', sa.Column('task_change_seq', sa.BigInteger(), server_default='0', nullable=False))
+    op.add_column('tasks', sa.Column('change_seq', sa.BigInteger(), server_default='0', nullable=False))
+    op.create_table(
+        'task_tombstones',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('task_id', sa.Integer(), nullable=False),
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('change_seq', sa.BigInteger(), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_task_tombstones_project_id_change_seq_task_id', 'task_tombstones',
+        ['project_id', 'change_seq', 'task_id'], unique=False,
+    )
+    # tasks may be large: build its index without blocking writes (see 0002)
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_tasks_project_id_change_seq_id', 'tasks', ['project_id', 'change_seq', 'id'],
+            unique=False, postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_tasks_project_id_change_seq_id', table_name='tasks', postgresql_concurrently=True)
+    op.drop_index('ix_task_tombstones_project_id_change_seq_task_id', table_name='task_tombstones')
+    op.drop_table('task_tombstones')
+    with op.batch_alter_table('tasks') as batch_op:
+        batch_op.drop_column('change_seq')
+    with op.batch_alter_table('projects') as batch_op:
+        batch_op.drop_column('task_change_seq')
@@ -0,0 +1,45 @@
+"""admin log details as JSON
+
+Stores admin_logs.details as native JSON (JSONB on Postgres) instead of
+json.dumps text, so it can be queried and indexed; existing values are
+converted in place.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 09:41:12.518307
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('admin_logs') as batch_op:
+        batch_op.alter_column(
+            'details',
+            existing_type=sa.String(),
+            type_=sa.JSON().with_variant(postgresql.JSONB(), 'postgresql'),
+            existing_nullable=True,
+            postgresql_using='details::jsonb',
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('admin_logs') as batch_op:
+        batch_op.alter_column(
+            'details',
+            existing_type=sa.JSON().with_variant(postgresql.JSONB(), 'postgresql'),
+            type_=sa.String(),
+            existing_nullable=True,
+            postgresql_using='details::text',
+        )
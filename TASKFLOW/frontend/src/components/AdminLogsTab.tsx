@@ -7,7 +7,7 @@ interface AdminLog {
     action: string
     target_type: string
     target_id: number
-    details: string | null
+    details: Record<string, unknown> | null
     created_at: string
 }
 
@@ -93,7 +93,7 @@ export default function AdminLogsTab() {
                                     <td className="px-6 py-4 text-sm text-gray-600">
                                         {log.details ? (
                                             <code className="bg-gray-100 px-2 py-1 rounded text-xs">
-                                                {log.details.substring(0, 50)}...
+                                                {JSON.stringify(log.details).substring(0, 50)}...
                                             </code>
                                         ) : (
                                             '-'
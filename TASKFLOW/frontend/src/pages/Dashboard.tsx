@@ -3,13 +3,18 @@ import { useEffect, useState } from 'react'
 import { FiChevronRight, FiFolder, FiPlus, FiTrash2 } from 'react-icons/fi'
 import { useNavigate } from 'react-router-dom'
 import CalendarView from '../components/CalendarView'
-import { createProject, deleteProject, getProjects } from '../services/api'
+import { createProject, deleteProject, getProjectsSummary } from '../services/api'
 
 interface Project {
   id: number
   name: string
   description?: string
   created_at: string
+  completion_percentage: number
+  task_count: number
+  done_count: number
+  overdue_count: number
+  next_due_date?: string | null
 }
 
 const Dashboard = () => {
@@ -27,7 +32,10 @@ const Dashboard = () => {
 
   const fetchProjects = async () => {
     try {
-      const response = await getProjects()
+      const response = await getProjectsSummary([
+        'name', 'description', 'created_at', 'completion_percentage',
+        'task_count', 'done_count', 'overdue_count', 'next_due_date',
+      ])
       setProjects(response.data)
     } catch (error) {
       console.error('Error fetching projects:', error)
@@ -63,6 +71,9 @@ const Dashboard = () => {
     }
   }
 
+  const completedTasks = projects.reduce((sum, p) => sum + p.done_count, 0)
+  const pendingTasks = projects.reduce((sum, p) => sum + p.task_count - p.done_count, 0)
+
   return (
     <div className="container mx-auto px-4 py-8 max-w-7xl">
       <div className="flex items-center justify-between mb-6">
@@ -87,11 +98,11 @@ const Dashboard = () => {
         </div>
         <div className="bg-white rounded-lg shadow-sm p-4 flex flex-col">
           <div className="text-sm text-gray-500">Completed</div>
-          <div className="text-2xl font-bold text-gray-900">0</div>
+          <div className="text-2xl font-bold text-gray-900">{completedTasks}</div>
         </div>
         <div className="bg-white rounded-lg shadow-sm p-4 flex flex-col">
           <div className="text-sm text-gray-500">Pending</div>
-          <div className="text-2xl font-bold text-gray-900">0</div>
+          <div className="text-2xl font-bold text-gray-900">{pendingTasks}</div>
         </div>
       </div>
 
@@ -154,7 +165,26 @@ const Dashboard = () => {
                 {project.description && (
                   <p className="text-gray-600 text-sm mb-4 line-clamp-2">{project.description}</p>
                 )}
-                <div className="text-xs text-gray-500">Created {new Date(project.created_at).toLocaleDateString()}</div>
+                <div className="mb-3">
+                  <div className="flex justify-between text-xs text-gray-500 mb-1">
+                    <span>{project.done_count}/{project.task_count} tasks done</span>
+                    <span>{Math.round(project.completion_percentage)}%</span>
+                  </div>
+                  <div className="w-full bg-gray-200 rounded-full h-2">
+                    <div
+                      className="bg-primary-600 h-2 rounded-full"
+                      style={{ width: `${project.completion_percentage}%` }}
+                    />
+                  </div>
+                </div>
+                <div className="flex justify-between text-xs text-gray-500">
+                  <span>Created {new Date(project.created_at).toLocaleDateString()}</span>
+                  {project.overdue_count > 0 ? (
+                    <span className="text-red-600">{project.overdue_count} overdue</span>
+                  ) : project.next_due_date ? (
+                    <span>Next due {new Date(project.next_due_date).toLocaleDateString()}</span>
+                  ) : null}
+                </div>
               </motion.div>
             ))}
           </div>
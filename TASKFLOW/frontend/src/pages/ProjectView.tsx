@@ -1,11 +1,11 @@
 import { motion } from 'framer-motion'
-import { useEffect, useState } from 'react'
+import { useEffect, useRef, useState } from 'react'
 import { FiPlus } from 'react-icons/fi'
 import { useNavigate, useParams } from 'react-router-dom'
 import CalendarView from '../components/CalendarView'
 import KanbanColumn from '../components/KanbanColumn'
 import TaskItem from '../components/TaskItem'
-import { createTask, deleteTask, getProject, getTasks, updateTask } from '../services/api'
+import { createTask, deleteTask, getProject, getTaskChanges, subscribeToProject, updateTask } from '../services/api'
 
 interface Project {
   id: number
@@ -18,6 +18,7 @@ interface Task {
   title: string
   description?: string
   status: 'todo' | 'in_progress' | 'done'
+  version: number
   created_at: string
   due_date?: string
   scheduled_day?: string
@@ -34,6 +35,8 @@ const ProjectView = () => {
   const [newTaskDesc, setNewTaskDesc] = useState('')
   const [newTaskDueDate, setNewTaskDueDate] = useState('')
   const [isCreating, setIsCreating] = useState(false)
+  // Delta-sync position in this project's task changes
+  const changesCursor = useRef<string | undefined>(undefined)
 
   useEffect(() => {
     if (id) {
@@ -41,13 +44,20 @@ const ProjectView = () => {
     }
   }, [id])
 
+  // Changes from other sessions arrive as events; pull them with a delta sync
+  useEffect(() => {
+    if (!id) return
+    return subscribeToProject(parseInt(id), () => {
+      syncTasks().catch((error) => console.error('Error syncing tasks:', error))
+    })
+  }, [id])
+
   const fetchData = async () => {
     try {
       const projectRes = await getProject(parseInt(id!))
       setProject(projectRes.data)
 
-      const tasksRes = await getTasks(parseInt(id!))
-      setTasks(tasksRes.data)
+      await syncTasks(true)
     } catch (error) {
       console.error('Error fetching data:', error)
     } finally {
@@ -55,6 +65,28 @@ const ProjectView = () => {
     }
   }
 
+  // Fetch only the tasks written or deleted since the last sync
+  const syncTasks = async (reset = false) => {
+    let since = reset ? undefined : changesCursor.current
+    const changed: Task[] = []
+    const deleted: number[] = []
+    let hasMore = true
+    while (hasMore) {
+      const res = await getTaskChanges(parseInt(id!), since)
+      changed.push(...res.data.changes)
+      deleted.push(...res.data.deleted.map((tombstone: { task_id: number }) => tombstone.task_id))
+      since = res.data.cursor
+      hasMore = res.data.has_more
+    }
+    changesCursor.current = since
+    setTasks((current) => {
+      const byId = new Map((reset ? [] : current).map((task) => [task.id, task]))
+      deleted.forEach((taskId) => byId.delete(taskId))
+      changed.forEach((task) => byId.set(task.id, task))
+      return Array.from(byId.values())
+    })
+  }
+
   const handleCreateTask = async (e: React.FormEvent) => {
     e.preventDefault()
     if (!newTaskTitle.trim()) return
@@ -71,7 +103,7 @@ const ProjectView = () => {
       setNewTaskDesc('')
       setNewTaskDueDate('')
       setShowModal(false)
-      await fetchData() // Ensure data is refreshed before closing loading state
+      await syncTasks() // Ensure data is refreshed before closing loading state
     } catch (error) {
       console.error('Error creating task:', error)
       alert('Failed to create task. Please try again.') // Simple feedback for now
@@ -81,10 +113,17 @@ const ProjectView = () => {
   }
 
   const handleUpdateTask = async (taskId: number, updates: Partial<Task>) => {
+    const task = tasks.find((t) => t.id === taskId)
     try {
-      await updateTask(taskId, updates)
-      fetchData()
-    } catch (error) {
+      await updateTask(taskId, { ...updates, version: task?.version })
+      syncTasks()
+    } catch (error: any) {
+      if (error.response?.status === 409) {
+        // Edited elsewhere since it was loaded: show the current version
+        alert('This task was changed in another tab. Reloading the latest version.')
+        syncTasks()
+        return
+      }
       console.error('Error updating task:', error)
     }
   }
@@ -92,7 +131,7 @@ const ProjectView = () => {
   const handleDeleteTask = async (taskId: number) => {
     try {
       await deleteTask(taskId)
-      fetchData()
+      syncTasks()
     } catch (error) {
       console.error('Error deleting task:', error)
     }
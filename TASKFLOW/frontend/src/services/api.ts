@@ -63,6 +63,11 @@ export const getProjects = () => {
   return api.get('/projects/')
 }
 
+// Projects with progress and task counts in one call; `fields` limits the columns returned
+export const getProjectsSummary = (fields?: string[]) => {
+  return api.get('/projects/summary', { params: fields ? { fields: fields.join(',') } : undefined })
+}
+
 export const createProject = (name: string, description?: string) => {
   return api.post('/projects/', { name, description })
 }
@@ -84,6 +89,34 @@ export const getTasks = (projectId: number) => {
   return api.get(`/tasks/project/${projectId}`)
 }
 
+export const getTaskChanges = (projectId: number, since?: string) => {
+  return api.get('/tasks/changes', { params: { project_id: projectId, since } })
+}
+
+// Live project events over a WebSocket, falling back to server-sent events
+// (EventSource reconnects by itself) when the socket fails or drops
+export const subscribeToProject = (projectId: number, onEvent: (message: any) => void) => {
+  const token = encodeURIComponent(localStorage.getItem('token') || '')
+  const path = `/events/projects/${projectId}`
+  const absoluteUrl = new URL(API_URL, window.location.href).href
+  let closed = false
+  let source: EventSource | null = null
+
+  const socket = new WebSocket(`${absoluteUrl.replace(/^http/, 'ws')}${path}/ws?token=${token}`)
+  socket.onmessage = (event) => onEvent(JSON.parse(event.data))
+  socket.onclose = () => {
+    if (closed) return
+    source = new EventSource(`${absoluteUrl}${path}/stream?token=${token}`)
+    source.onmessage = (event) => onEvent(JSON.parse(event.data))
+  }
+
+  return () => {
+    closed = true
+    socket.close()
+    source?.close()
+  }
+}
+
 export const createTask = (projectId: number, title: string, description?: string) => {
   return api.post('/tasks/', { 
     project_id: projectId, 
@@ -93,7 +126,7 @@ export const createTask = (projectId: number, title: string, description?: strin
   })
 }
 
-export const updateTask = (id: number, data: { title?: string; description?: string; status?: string }) => {
+export const updateTask = (id: number, data: { title?: string; description?: string; status?: string; version?: number }) => {
   return api.put(`/tasks/${id}`, data)
 }
 
@@ -123,5 +156,13 @@ export const exportUsersCsv = () => {
   return api.get('/users/export', { responseType: 'blob' })
 }
 
+export const exportProjectsCsv = (gzip = false) => {
+  return api.get('/admin/projects/export', { params: { gzip }, responseType: 'blob' })
+}
+
+export const exportTasksCsv = (gzip = false) => {
+  return api.get('/admin/tasks/export', { params: { gzip }, responseType: 'blob' })
+}
+
 export default api
 